@@ -0,0 +1,98 @@
+# bench_ann.py - recall@k and query latency of the FAISS index types against the exact flat index
+#
+#   cd chatbot
+#   python benchmarks/bench_ann.py --sizes 1000,10000,50000 --types flat,ivf_flat,hnsw,ivf_pq
+#
+# Uses synthetic text and a hashing embedder, so it runs offline without the bge model.
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.config import IVF_NLIST, IVF_NPROBE, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH, PQ_M, PQ_NBITS
+from chatbot.index_factory import build_index, set_search_params, describe
+from synthetic import synthetic_corpus, synthetic_questions, HashingEmbeddings, percentile
+
+
+def run(size, index_types, queries, ks, embedder, args):
+    print(f"\n📚 Corpus of {size} chunks")
+    started = time.perf_counter()
+    vectors = np.asarray(embedder.embed_documents(synthetic_corpus(size)), dtype=np.float32)
+    query_vectors = np.asarray(embedder.embed_documents(queries), dtype=np.float32)
+    print(f"   ↳ embedded in {time.perf_counter() - started:.1f}s")
+
+    k_max = max(ks)
+    exact = build_index(vectors, "flat")
+    exact.add(vectors)
+    _, truth = exact.search(query_vectors, k_max)
+
+    results = []
+    for index_type in index_types:
+        started = time.perf_counter()
+        index = build_index(vectors, index_type, nlist=args.nlist, hnsw_m=HNSW_M,
+                            ef_construction=HNSW_EF_CONSTRUCTION, pq_m=args.pq_m, pq_nbits=PQ_NBITS)
+        index.add(vectors)
+        set_search_params(index, args.nprobe, args.ef_search)
+        build_seconds = time.perf_counter() - started
+
+        latencies = []
+        found = np.empty((len(queries), k_max), dtype=np.int64)
+        for i, q in enumerate(query_vectors):
+            t = time.perf_counter()
+            _, ids = index.search(q[None, :], k_max)
+            latencies.append((time.perf_counter() - t) * 1000)
+            found[i] = ids[0]
+
+        recall = {
+            f"recall@{k}": float(np.mean([len(set(found[i, :k]) & set(truth[i, :k])) / k for i in range(len(queries))]))
+            for k in ks
+        }
+        row = {
+            "size": size,
+            "index": index_type,
+            "description": describe(index),
+            "build_s": round(build_seconds, 3),
+            "p50_ms": round(percentile(latencies, 50), 4),
+            "p99_ms": round(percentile(latencies, 99), 4),
+            **{name: round(value, 4) for name, value in recall.items()},
+        }
+        results.append(row)
+        recall_text = "  ".join(f"{name}={value:.3f}" for name, value in recall.items())
+        print(f"   {index_type:<9} build {build_seconds:7.2f}s  p50 {row['p50_ms']:.3f}ms  p99 {row['p99_ms']:.3f}ms  {recall_text}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types on synthetic text.")
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--types", default="flat,ivf_flat,hnsw,ivf_pq")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", default="3,10")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--nlist", type=int, default=IVF_NLIST)
+    parser.add_argument("--nprobe", type=int, default=IVF_NPROBE)
+    parser.add_argument("--ef-search", type=int, default=HNSW_EF_SEARCH)
+    parser.add_argument("--pq-m", type=int, default=PQ_M)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    embedder = HashingEmbeddings(args.dim)
+    queries = synthetic_questions(args.queries)
+    ks = [int(k) for k in args.k.split(",")]
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        results.extend(run(size, args.types.split(","), queries, ks, embedder, args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
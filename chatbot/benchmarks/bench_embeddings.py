@@ -0,0 +1,169 @@
+# bench_embeddings.py - torch vs ONNX (fp32 / int8) embedding backends: latency, throughput, RSS and recall
+#
+#   cd chatbot
+#   python chatbot/export_onnx.py
+#   python benchmarks/bench_embeddings.py --backends torch,onnx,onnx-int8 --min-recall 0.95
+#
+# Each backend runs in its own process, so RSS and import cost are measured in isolation. The chunks come
+# from data/Cleaned (split like ingest.py) and the questions from harness.HR_QUESTIONS. Recall@k is the
+# overlap of each backend's top-k chunks with the torch fp32 top-k, i.e. with what the current index returns.
+# Exits with status 1 when a backend falls below --min-recall.
+
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+CHATBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CHATBOT_DIR)
+
+from chatbot.config import (
+    EMBEDDING_MODEL_NAME, EMBED_NORMALIZE, EMBED_BATCH_SIZE, CHUNK_SIZE, CHUNK_OVERLAP, CLEANED_DIR,
+    ONNX_MODEL_DIR, ONNX_THREADS, ONNX_MAX_LENGTH,
+)
+from synthetic import percentile
+
+REFERENCE = "torch"
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def load_texts(max_chunks):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from harness import HR_QUESTIONS
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunks = []
+    directory = os.path.join(CHATBOT_DIR, CLEANED_DIR)
+    for file in sorted(os.listdir(directory)):
+        if file.endswith(".txt"):
+            with open(os.path.join(directory, file), encoding="utf-8") as f:
+                chunks.extend(splitter.split_text(f.read()))
+    return chunks[:max_chunks], HR_QUESTIONS
+
+
+def run_backend(name, texts_path, vectors_path, batch_size):
+    """Child process: load one backend, encode everything, report timings (vectors go to an .npz)."""
+    from chatbot.embedding_backend import load_embedding_model
+
+    with open(texts_path, encoding="utf-8") as f:
+        texts = json.load(f)
+    baseline_rss = rss_mb()
+    started = time.perf_counter()
+    model = load_embedding_model(
+        "onnx" if name.startswith("onnx") else "torch", EMBEDDING_MODEL_NAME, EMBED_NORMALIZE, batch_size,
+        onnx_dir=os.path.join(CHATBOT_DIR, ONNX_MODEL_DIR), quantized=name == "onnx-int8",
+        max_length=ONNX_MAX_LENGTH, threads=ONNX_THREADS,
+    )
+    load_seconds = time.perf_counter() - started
+    loaded_rss = rss_mb()
+
+    model.embed_query(texts["questions"][0])  # warm-up
+    latencies = []
+    for question in texts["questions"]:
+        started = time.perf_counter()
+        model.embed_query(question)
+        latencies.append((time.perf_counter() - started) * 1000)
+    queries = np.asarray(model.embed_documents(texts["questions"]), dtype=np.float32)
+
+    started = time.perf_counter()
+    docs = np.asarray(model.embed_documents(texts["chunks"]), dtype=np.float32)
+    encode_seconds = time.perf_counter() - started
+    np.savez(vectors_path, docs=docs, queries=queries)
+
+    return {
+        "backend": name,
+        "load_s": round(load_seconds, 2),
+        "torch_imported": "torch" in sys.modules,
+        "rss_baseline_mb": round(baseline_rss, 1),
+        "rss_loaded_mb": round(loaded_rss, 1),
+        "rss_peak_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "query_p50_ms": round(percentile(latencies, 50), 2),
+        "query_p95_ms": round(percentile(latencies, 95), 2),
+        "chunks_per_s": round(len(texts["chunks"]) / encode_seconds, 1),
+    }
+
+
+def top_k(queries, docs, k):
+    return np.argsort(-(queries @ docs.T), axis=1)[:, :k]
+
+
+def recall_at_k(reference, candidate, k):
+    truth = top_k(reference["queries"], reference["docs"], k)
+    found = top_k(candidate["queries"], candidate["docs"], k)
+    return float(np.mean([len(set(found[i]) & set(truth[i])) / k for i in range(len(truth))]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the torch and ONNX embedding backends.")
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--max-chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--k", default="3,10")
+    parser.add_argument("--min-recall", type=float, default=0.95, help="lowest acceptable recall@3 against torch fp32")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--child", nargs=3, metavar=("BACKEND", "TEXTS", "VECTORS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_backend(*args.child, args.batch_size)))
+        return
+
+    backends = args.backends.split(",")
+    if REFERENCE not in backends:
+        backends.insert(0, REFERENCE)
+    ks = [int(k) for k in args.k.split(",")]
+    work_dir = tempfile.mkdtemp(prefix="chatbot-embed-")
+    chunks, questions = load_texts(args.max_chunks)
+    texts_path = os.path.join(work_dir, "texts.json")
+    with open(texts_path, "w", encoding="utf-8") as f:
+        json.dump({"chunks": chunks, "questions": questions}, f)
+    print(f"📚 {len(chunks)} chunk(s), {len(questions)} question(s)")
+
+    results, vectors = [], {}
+    for name in backends:
+        vectors_path = os.path.join(work_dir, f"{name}.npz")
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--batch-size", str(args.batch_size), "--child", name, texts_path, vectors_path],
+            check=True, capture_output=True, text=True, cwd=CHATBOT_DIR,
+        ).stdout
+        row = json.loads(output.strip().splitlines()[-1])
+        vectors[name] = dict(np.load(vectors_path))
+        results.append(row)
+
+    failed = []
+    print()
+    for row in results:
+        for k in ks:
+            row[f"recall@{k}"] = round(recall_at_k(vectors[REFERENCE], vectors[row["backend"]], k), 4)
+        if row[f"recall@{ks[0]}"] < args.min_recall:
+            failed.append(row["backend"])
+        recall_text = "  ".join(f"recall@{k}={row[f'recall@{k}']:.3f}" for k in ks)
+        print(
+            f"   {row['backend']:<10} load {row['load_s']:6.2f}s  query p50 {row['query_p50_ms']:7.2f}ms  "
+            f"{row['chunks_per_s']:8.1f} chunks/s  RSS {row['rss_loaded_mb']:7.1f} MB (peak {row['rss_peak_mb']:.1f})  "
+            f"torch={'yes' if row['torch_imported'] else 'no'}  {recall_text}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+    if failed:
+        print(f"\n❌ recall@{ks[0]} below {args.min_recall} for: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
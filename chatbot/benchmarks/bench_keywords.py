@@ -0,0 +1,90 @@
+# bench_keywords.py - bulk keyword screening: the old per-keyword loop vs the precompiled KeywordMatcher
+#
+#   cd chatbot
+#   python benchmarks/bench_keywords.py --n 20000
+#
+# Questions come from question_log.txt and logs/requests.jsonl when present, topped up with synthetic ones.
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from rapidfuzz import fuzz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.config import KEYWORDS_FILE, HR_FUZZY_THRESHOLD
+from chatbot.keyword_matcher import KeywordMatcher, load_keyword_sets
+from synthetic import synthetic_questions
+
+
+def legacy_is_hr_query(question, keywords, threshold):
+    # What main.is_hr_query did before the matcher: substring test, then partial_ratio per keyword
+    question = question.lower()
+    for kw in keywords:
+        if kw in question:
+            return True
+        if fuzz.partial_ratio(kw, question) >= threshold:
+            return True
+    return False
+
+
+def logged_questions():
+    questions = []
+    if os.path.exists("question_log.txt"):
+        with open("question_log.txt", encoding="utf-8") as f:
+            questions += [m.group(1) for m in re.finditer(r" - Q: (.*)", f.read())]
+    if os.path.exists(os.path.join("logs", "requests.jsonl")):
+        with open(os.path.join("logs", "requests.jsonl"), encoding="utf-8") as f:
+            questions += [json.loads(line).get("question", "") for line in f]
+    return [q for q in questions if q]
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk HR keyword screening.")
+    parser.add_argument("--n", type=int, default=20000, help="questions to screen")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    questions = logged_questions()
+    questions += synthetic_questions(max(0, args.n - len(questions)))
+    questions = (questions * (args.n // max(len(questions), 1) + 1))[:args.n]
+    keywords = load_keyword_sets(KEYWORDS_FILE)["hr_keywords"]
+    matcher = KeywordMatcher(keywords, HR_FUZZY_THRESHOLD)
+
+    legacy, legacy_s = timed(lambda: [legacy_is_hr_query(q, keywords, HR_FUZZY_THRESHOLD) for q in questions])
+    single, single_s = timed(lambda: [matcher.matches(q) for q in questions])
+    bulk, bulk_s = timed(lambda: matcher.matches_many(questions))
+
+    mismatches = sum(a != b for a, b in zip(legacy, single)) + sum(a != b for a, b in zip(legacy, bulk))
+    results = {
+        "questions": len(questions),
+        "hr_hits": sum(legacy),
+        "legacy_loop_s": round(legacy_s, 3),
+        "matcher_per_question_s": round(single_s, 3),
+        "matcher_bulk_cdist_s": round(bulk_s, 3),
+        "mismatches": mismatches,
+    }
+    print(f"🔤 Screened {len(questions)} question(s), {results['hr_hits']} HR hit(s)")
+    print(f"   legacy loop            {legacy_s:8.3f}s")
+    print(f"   KeywordMatcher.matches {single_s:8.3f}s  ({legacy_s / single_s:.1f}x)")
+    print(f"   matches_many (cdist)   {bulk_s:8.3f}s  ({legacy_s / bulk_s:.1f}x)")
+    if mismatches:
+        print(f"⚠️ {mismatches} result(s) differ from the legacy loop")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# bench_load.py - startup time and memory of VECTORSTORE_LOAD_MODE "pickle" vs "mmap" for each FAISS index type
+#
+#   cd chatbot
+#   python benchmarks/bench_load.py --size 50000 --types flat,ivf_flat,hnsw,ivf_pq
+#
+# Builds one synthetic vector store per index type (random unit vectors, synthetic chunk text) the way
+# ingest.py writes it (index.faiss + index.pkl + docstore.sqlite), then loads it in a fresh process per
+# mode. "private" is RssAnon: memory that is the worker's own. Mapped index pages show up in RSS but
+# not there, because they live in the page cache and are shared by every worker mapping the file.
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+from harness import CHATBOT_DIR, OfflineEmbeddings
+from synthetic import synthetic_corpus, synthetic_questions
+
+
+def memory_mb():
+    usage = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "RssAnon:")):
+                usage[line.split(":")[0]] = int(line.split()[1]) / 1024
+    return usage.get("VmRSS", 0.0), usage.get("RssAnon", 0.0)
+
+
+def build_store(directory, index_type, size, dim):
+    from langchain_community.vectorstores import FAISS
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from chatbot.config import IVF_NLIST, HNSW_M, HNSW_EF_CONSTRUCTION, PQ_M, PQ_NBITS
+    from chatbot.index_factory import build_index
+    from chatbot.lazy_store import export_docstore
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((size, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    texts = synthetic_corpus(size)
+    index = build_index(vectors, index_type, nlist=IVF_NLIST, hnsw_m=HNSW_M,
+                        ef_construction=HNSW_EF_CONSTRUCTION, pq_m=PQ_M, pq_nbits=PQ_NBITS)
+    store = FAISS(OfflineEmbeddings(dim), index, InMemoryDocstore(), {})
+    metadatas = [{"source": f"doc{i % 50}.docx", "title": f"doc {i % 50}", "doc_type": "general", "chunk_index": i}
+                 for i in range(size)]
+    store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=[f"chunk-{i}" for i in range(size)])
+    store.save_local(directory)
+    export_docstore(store, directory)
+
+
+def run_child(args):
+    from langchain_community.vectorstores import FAISS
+    from chatbot.lazy_store import load_mmap_vectorstore
+    from chatbot.index_factory import set_search_params
+    from chatbot.config import IVF_NPROBE, HNSW_EF_SEARCH
+
+    directory, mode = args.child
+    embeddings = OfflineEmbeddings(args.dim)
+    queries = np.asarray(embeddings.embed_documents(synthetic_questions(args.queries)), dtype=np.float32)
+    rss_before, private_before = memory_mb()
+
+    started = time.perf_counter()
+    if mode == "mmap":
+        store = load_mmap_vectorstore(directory, embeddings)
+    else:
+        store = FAISS.load_local(directory, embeddings, allow_dangerous_deserialization=True)
+    load_seconds = time.perf_counter() - started
+    rss_loaded, private_loaded = memory_mb()
+
+    set_search_params(store.index, IVF_NPROBE, HNSW_EF_SEARCH)
+    started = time.perf_counter()
+    for vector in queries:
+        store.similarity_search_with_score_by_vector(vector.tolist(), k=5)
+    search_seconds = time.perf_counter() - started
+    rss_searched, private_searched = memory_mb()
+
+    print("BENCH " + json.dumps({
+        "load_ms": round(load_seconds * 1000, 1),
+        "rss_loaded_mb": round(rss_loaded - rss_before, 1),
+        "private_loaded_mb": round(private_loaded - private_before, 1),
+        "rss_searched_mb": round(rss_searched - rss_before, 1),
+        "private_searched_mb": round(private_searched - private_before, 1),
+        "search_ms_per_query": round(search_seconds * 1000 / len(queries), 2),
+    }), flush=True)
+
+
+def measure(args, directory, mode):
+    command = [sys.executable, os.path.abspath(__file__), "--dim", str(args.dim), "--queries", str(args.queries),
+               "--child", directory, mode]
+    output = subprocess.run(command, capture_output=True, text=True, cwd=CHATBOT_DIR, check=True).stdout
+    for line in output.splitlines():
+        if line.startswith("BENCH "):
+            return json.loads(line[len("BENCH "):])
+    raise RuntimeError(f"No result from the {mode} child:\n{output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vector store loading: pickle vs mmap.")
+    parser.add_argument("--size", type=int, default=50000, help="chunks in the synthetic store")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--types", default="flat,ivf_flat,hnsw,ivf_pq")
+    parser.add_argument("--modes", default="pickle,mmap")
+    parser.add_argument("--queries", type=int, default=200, help="searches run after loading")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--child", nargs=2, metavar=("DIRECTORY", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="chatbot-load-")
+    for index_type in args.types.split(","):
+        directory = os.path.join(work_dir, index_type)
+        started = time.perf_counter()
+        build_store(directory, index_type, args.size, args.dim)
+        print(f"\n📚 {index_type}: {args.size} chunks built in {time.perf_counter() - started:.1f}s")
+        for mode in args.modes.split(","):
+            stats = {"index_type": index_type, "mode": mode, **measure(args, directory, mode)}
+            results.append(stats)
+            print(
+                f"   {mode:<7} load {stats['load_ms']:8.1f} ms  RSS +{stats['rss_loaded_mb']:7.1f} MB "
+                f"(private +{stats['private_loaded_mb']:7.1f} MB)  after {args.queries} searches: "
+                f"RSS +{stats['rss_searched_mb']:7.1f} MB (private +{stats['private_searched_mb']:7.1f} MB)  "
+                f"{stats['search_ms_per_query']:.2f} ms/query"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# bench_micro.py - micro-benchmarks for the hot helpers: ingest, FAISS search, is_hr_query, truncate_answer
+#
+#   cd chatbot
+#   python benchmarks/bench_micro.py --output benchmarks/micro_baseline.json
+#
+# Offline like load_test.py (hashing embedder, stub LLM, temporary index built from data/Cleaned).
+
+import os
+import json
+import time
+import argparse
+import tempfile
+
+from harness import HR_QUESTIONS, OfflineEmbeddings, build_offline_index, load_app
+from stub_llm import StubChatModel, ANSWER_TEXT
+from bench_ann import run as run_ann
+from chatbot.config import IVF_NLIST, IVF_NPROBE, HNSW_EF_SEARCH, PQ_M
+
+
+def per_call_us(fn, inputs, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for value in inputs:
+            fn(value)
+    return (time.perf_counter() - started) / (repeat * len(inputs)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for ingest, FAISS search and the text helpers.")
+    parser.add_argument("--faiss-sizes", default="10000,50000")
+    parser.add_argument("--faiss-types", default="flat,hnsw")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=1, help="ingest worker processes")
+    parser.add_argument("--output", help="write the results as a JSON baseline to this file")
+    args = parser.parse_args()
+
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="chatbot-micro-")
+    index_dir = os.path.join(work_dir, "faiss_index")
+    embeddings = OfflineEmbeddings()
+
+    print("📥 ingest_documents()")
+    results["ingest_full_s"] = round(build_offline_index(index_dir, embeddings, workers=args.workers), 3)
+    results["ingest_incremental_noop_s"] = round(build_offline_index(index_dir, embeddings, incremental=True, workers=args.workers), 3)
+    print(f"   full {results['ingest_full_s']}s, incremental with nothing changed {results['ingest_incremental_noop_s']}s")
+
+    print("\n🔎 FAISS search at scale")
+    ann_args = argparse.Namespace(nlist=IVF_NLIST, nprobe=IVF_NPROBE, ef_search=HNSW_EF_SEARCH, pq_m=PQ_M)
+    queries = HR_QUESTIONS * 4
+    results["faiss"] = []
+    for size in (int(s) for s in args.faiss_sizes.split(",")):
+        results["faiss"].extend(run_ann(size, args.faiss_types.split(","), queries, [3], embeddings, ann_args))
+
+    print("\n🔤 Text helpers")
+    main_module = load_app(index_dir, work_dir, embeddings, StubChatModel())
+    long_answers = [" ".join([ANSWER_TEXT] * n) for n in (1, 5, 10, 20)]
+    results["is_hr_query_us"] = round(per_call_us(main_module.is_hr_query, HR_QUESTIONS, args.repeat), 2)
+    results["truncate_answer_us"] = round(per_call_us(main_module.truncate_answer, long_answers, args.repeat), 2)
+    print(f"   is_hr_query      {results['is_hr_query_us']:9.2f} µs/call")
+    print(f"   truncate_answer  {results['truncate_answer_us']:9.2f} µs/call")
+    main_module.request_log.close()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
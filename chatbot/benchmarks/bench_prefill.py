@@ -0,0 +1,78 @@
+# bench_prefill.py - prefill (prompt evaluation) time per request: flat string prompt vs layered chat messages
+#
+#   ollama pull llama3.2
+#   cd chatbot
+#   python benchmarks/bench_prefill.py --model llama3.2 --requests 30
+#
+# Needs a running Ollama. Each request generates a single token, so the time reported is almost all prefill.
+# Ollama's prompt_eval_count only counts tokens it actually had to evaluate, so a reused prefix shows up
+# as fewer tokens as well as less time.
+
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_ollama import ChatOllama
+from chatbot.config import OLLAMA_KEEP_ALIVE
+from chatbot.prompts import format_context, grounded_messages, legacy_prompt
+from synthetic import synthetic_corpus, synthetic_questions, percentile
+
+
+def workload(n_requests, n_contexts, chunks_per_context):
+    """(context block, question) pairs; contexts repeat the way popular documents do in real traffic."""
+    chunks = synthetic_corpus(n_contexts * chunks_per_context)
+    contexts = [
+        format_context("\n".join(chunks[i * chunks_per_context:(i + 1) * chunks_per_context]))
+        for i in range(n_contexts)
+    ]
+    questions = synthetic_questions(n_requests)
+    return [(contexts[i % n_contexts], question) for i, question in enumerate(questions)]
+
+
+def measure(llm, prompts):
+    durations, counts = [], []
+    for prompt in prompts:
+        metadata = llm.invoke(prompt).response_metadata
+        durations.append(metadata.get("prompt_eval_duration", 0) / 1e6)
+        counts.append(metadata.get("prompt_eval_count", 0))
+    return {
+        "p50_ms": round(percentile(durations, 50), 1),
+        "p95_ms": round(percentile(durations, 95), 1),
+        "mean_ms": round(sum(durations) / len(durations), 1),
+        "mean_prompt_tokens": round(sum(counts) / len(counts), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Ollama prefill time for flat vs layered prompts.")
+    parser.add_argument("--model", default="llama3.2")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--contexts", type=int, default=5)
+    parser.add_argument("--chunks", type=int, default=3, help="chunks per context block")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    pairs = workload(args.requests, args.contexts, args.chunks)
+    llm = ChatOllama(model=args.model, num_predict=1, keep_alive=OLLAMA_KEEP_ALIVE)
+    llm.invoke("Hi")  # load the model so the first measured request doesn't include the load time
+
+    results = {
+        "before (flat prompt)": measure(llm, [legacy_prompt(context, q) for context, q in pairs]),
+        "after (system + context + user)": measure(llm, [grounded_messages(context, q) for context, q in pairs]),
+    }
+    print(f"\n⚡ Prefill per request, {args.requests} requests over {args.contexts} contexts ({args.model})")
+    for name, row in results.items():
+        print(f"   {name:<32} p50 {row['p50_ms']:8.1f}ms  p95 {row['p95_ms']:8.1f}ms  "
+              f"mean {row['mean_ms']:8.1f}ms  tokens {row['mean_prompt_tokens']:.0f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, **results}, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
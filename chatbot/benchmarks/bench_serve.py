@@ -0,0 +1,103 @@
+# bench_serve.py - time-to-ready and memory of serve.py for 1, 4 and 8 workers, preloaded vs per-worker import
+#
+#   cd chatbot
+#   python benchmarks/bench_serve.py --workers 1,4,8 --output benchmarks/serve_baseline.json
+#   python benchmarks/bench_serve.py --app real   # the real models and index (Ollama must be running)
+#
+# Every configuration runs serve.py in a fresh process and is measured from process start until all
+# workers have answered their warmup. "no-preload" is what `uvicorn --workers N` does: every worker
+# imports and loads everything itself. RSS is summed over master + workers (shared pages counted once
+# per process); PSS splits shared pages, so it is the actual memory used.
+
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import tempfile
+import subprocess
+
+from harness import CHATBOT_DIR, OfflineEmbeddings, build_offline_index, load_app
+from load_test import free_port
+from stub_llm import StubChatModel
+
+
+def run_child(args):
+    import serve
+
+    if args.app == "offline":
+        work_dir = tempfile.mkdtemp(prefix="chatbot-serve-")
+        embeddings = OfflineEmbeddings()
+        load = lambda: load_app(args.index_dir, work_dir, embeddings, StubChatModel())
+    else:
+        os.chdir(CHATBOT_DIR)
+        load = serve.load_app
+
+    def report(stats):
+        print("BENCH " + json.dumps(stats), flush=True)
+
+    mode, workers, port = args.child
+    serve.serve("127.0.0.1", int(port), int(workers), preload=mode == "preload", load=load, on_ready=report)
+
+
+def measure(args, mode, workers):
+    command = [sys.executable, os.path.abspath(__file__), "--app", args.app, "--index-dir", args.index_dir,
+               "--child", mode, str(workers), str(free_port())]
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, cwd=CHATBOT_DIR)
+    try:
+        for line in process.stdout:
+            if line.startswith("BENCH "):
+                stats = json.loads(line[len("BENCH "):])
+                stats["process_to_ready_s"] = round(time.perf_counter() - started, 2)
+                return stats
+        raise RuntimeError(f"serve.py exited with status {process.wait()} before its workers were ready")
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serve.py startup time and memory.")
+    parser.add_argument("--workers", default="1,4,8")
+    parser.add_argument("--modes", default="preload,no-preload")
+    parser.add_argument("--app", choices=["offline", "real"], default="offline",
+                        help="offline: hashing embedder + stub LLM; real: main.py as configured")
+    parser.add_argument("--index-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "WORKERS", "PORT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    if args.app == "offline":
+        args.index_dir = os.path.join(tempfile.mkdtemp(prefix="chatbot-serve-"), "faiss_index")
+        print(f"📚 Building offline index in {args.index_dir}")
+        build_offline_index(args.index_dir, OfflineEmbeddings())
+    else:
+        args.index_dir = ""
+
+    results = []
+    for mode in args.modes.split(","):
+        for workers in (int(n) for n in args.workers.split(",")):
+            stats = measure(args, mode, workers)
+            results.append(stats)
+            print(
+                f"   {mode:<10} {workers:>2} worker(s)  ready in {stats['process_to_ready_s']:6.2f}s  "
+                f"RSS {stats['rss_total_mb']:8.1f} MB  PSS {stats['pss_total_mb']:8.1f} MB"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
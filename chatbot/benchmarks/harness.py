@@ -0,0 +1,108 @@
+# harness.py - builds an offline index and imports the FastAPI app against the stub LLM
+#
+# Nothing here touches models/faiss_index, Ollama or the network: the index is built from data/Cleaned
+# into a temporary directory with the hashing embedder, and chatbot.llm_loader / chatbot.rag_chain are
+# replaced by in-process stand-ins before main.py is imported.
+
+import os
+import sys
+import time
+import types
+from langchain_core.embeddings import Embeddings
+
+CHATBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CHATBOT_DIR)
+# ingest.py imports its siblings as top-level modules (it is normally run from chatbot/chatbot)
+sys.path.insert(1, os.path.join(CHATBOT_DIR, "chatbot"))
+
+from synthetic import HashingEmbeddings
+from stub_llm import StubChatModel
+
+HR_QUESTIONS = [
+    "How do I apply for annual leave?",
+    "What is the process for medical leave?",
+    "Can I carry forward my unused leave to next year?",
+    "What are the pantry rules?",
+    "Who cleans the fridge in the pantry?",
+    "What is the meeting etiquette for online meetings?",
+    "Should I turn on my camera during a virtual meeting?",
+    "What should I do in a physical meeting with a client?",
+    "How do I return my laptop when I leave the company?",
+    "Can I install my own software on the company laptop?",
+    "What is in the quality manual?",
+    "Show me the cover page of the quality procedure",
+    "What is a controlled copy?",
+    "How do I set up the webmail autoresponder?",
+    "What should my email signature look like?",
+    "How do I import a supplier invoice into ABSS?",
+    "What is MMP-01 about?",
+    "What does PSC-01 say about purchasing?",
+    "What are the steps in the offboarding process?",
+    "What do I need to hand over before my last day?",
+    "How do I submit a complaint to HR?",
+    "When is payroll processed each month?",
+    "What is the policy on attendance and punctuality?",
+    "How is feedback collected after training?",
+    "What is the onboarding workflow for new staff?",
+    "Where do I find the HRD-01 procedure?",
+    "What happens during an internal audit?",
+    "What is the resignation notice period?",
+    # Follow-ups and off-topic questions, as they show up in real traffic
+    "What about for interns?",
+    "And how long does that take?",
+    "What is 1+1?",
+    "What should I eat for lunch today?",
+    "I feel sad about my relationship, what should I do?",
+]
+
+
+class OfflineEmbeddings(HashingEmbeddings, Embeddings):
+    """The benchmarks' hashing embedder as a LangChain Embeddings object (what FAISS and main.py expect)."""
+
+
+def build_offline_index(index_dir, embeddings, incremental=False, workers=1):
+    """Run ingest_documents() from data/Cleaned into `index_dir` with the offline embedder. Returns seconds."""
+    import ingest
+
+    ingest.VECTORSTORE_DIR = index_dir
+    ingest.make_embeddings = lambda *args, **kwargs: embeddings
+    os.makedirs(index_dir, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(CHATBOT_DIR)
+    try:
+        started = time.perf_counter()
+        ingest.ingest_documents(incremental=incremental, workers=workers)
+        return time.perf_counter() - started
+    finally:
+        os.chdir(cwd)
+
+
+def load_app(index_dir, work_dir, embeddings, llm: StubChatModel, answer_cache=False):
+    """Import main.py against `index_dir` and `llm`; returns the imported module (main.app is the app)."""
+    from langchain_community.vectorstores import FAISS
+    import chatbot.config as config
+    import chatbot.embedding_backend as embedding_backend
+    from chatbot.index_snapshots import current_index_dir
+
+    # main.py reads these at import time
+    config.VECTORSTORE_DIR = index_dir
+    config.VECTORSTORE_LOAD_MODE = "pickle"
+    config.EMBEDDING_CACHE_DIR = os.path.join(work_dir, "embedding_cache")
+    config.REQUEST_LOG_PATH = os.path.join(work_dir, "requests.jsonl")
+    config.SESSION_DB_PATH = None
+    config.ANSWER_CACHE_ENABLED = answer_cache
+    # Snapshots are hot-swapped by hand in the benchmarks, not by the watcher
+    config.INDEX_RELOAD_POLL_SECONDS = 0
+    embedding_backend.load_embedding_model = lambda *args, **kwargs: embeddings
+
+    llm_loader = types.ModuleType("chatbot.llm_loader")
+    llm_loader.llama_pipeline = llm
+    rag_chain = types.ModuleType("chatbot.rag_chain")
+    rag_chain.load_chain = lambda: (None, FAISS.load_local(current_index_dir(index_dir), embeddings, allow_dangerous_deserialization=True))
+    sys.modules["chatbot.llm_loader"] = llm_loader
+    sys.modules["chatbot.rag_chain"] = rag_chain
+
+    # main.py mounts static/ and data/pdfs relative to the working directory
+    os.chdir(CHATBOT_DIR)
+    import main
+    return main
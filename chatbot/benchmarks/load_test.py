@@ -0,0 +1,164 @@
+# load_test.py - throughput and latency of the FastAPI app under concurrent HR questions
+#
+#   cd chatbot
+#   python benchmarks/load_test.py --concurrency 8 --requests 200 --output benchmarks/baseline.json
+#   python benchmarks/load_test.py --concurrency 8 --requests 200 --compare benchmarks/baseline.json
+#
+# Runs fully offline: the LLM is benchmarks/stub_llm.py (fixed prefill latency and token rate) and the
+# index is built from data/Cleaned with the hashing embedder, so the numbers measure the server's own
+# overhead (classification, retrieval, queueing, streaming), not the model.
+
+import os
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+import uvicorn
+
+from harness import HR_QUESTIONS, OfflineEmbeddings, build_offline_index, load_app
+from stub_llm import StubChatModel
+from synthetic import percentile
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app, port):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def ask(port, path, question, session_id):
+    """One request; returns (status, total seconds, time-to-first-byte seconds)."""
+    body = json.dumps({"question": question, "session_id": session_id})
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    started = time.perf_counter()
+    try:
+        conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        ttfb = None
+        if path.endswith("/stream") and response.status == 200:
+            # Time to the first streamed token, which is what the user sees
+            for line in response:
+                if ttfb is None and line.startswith(b"event: token"):
+                    ttfb = time.perf_counter() - started
+        else:
+            response.read()
+            ttfb = time.perf_counter() - started
+        return response.status, time.perf_counter() - started, ttfb
+    finally:
+        conn.close()
+
+
+def replay(port, path, n_requests, concurrency):
+    def worker(i):
+        # A handful of sessions per worker, so follow-up questions have history to lean on
+        session_id = f"bench-{i % (concurrency * 4)}"
+        return ask(port, path, HR_QUESTIONS[i % len(HR_QUESTIONS)], session_id)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, range(n_requests)))
+    return results, time.perf_counter() - started
+
+
+def stage_breakdown(log_path):
+    stages = {}
+    with open(log_path, encoding="utf-8") as f:
+        for line in f:
+            for name, ms in json.loads(line).get("timings_ms", {}).items():
+                stages.setdefault(name, []).append(ms)
+    return {
+        name: {"p50_ms": round(percentile(values, 50), 2), "p95_ms": round(percentile(values, 95), 2), "count": len(values)}
+        for name, values in sorted(stages.items())
+    }
+
+
+def summarize(results, wall_seconds):
+    ok = [r for r in results if r[0] == 200]
+    latencies = [r[1] * 1000 for r in ok]
+    ttfbs = [r[2] * 1000 for r in ok if r[2] is not None]
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "busy_503": sum(1 for r in results if r[0] == 503),
+        "errors": sum(1 for r in results if r[0] not in (200, 503)),
+        "rps": round(len(ok) / wall_seconds, 2),
+        **{f"latency_p{q}_ms": round(percentile(latencies, q), 1) for q in (50, 95, 99)},
+        **{f"ttfb_p{q}_ms": round(percentile(ttfbs, q), 1) for q in (50, 95, 99)},
+    }
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["summary"]
+    print(f"\n📊 Compared with {baseline_path}")
+    for key in ("rps", "latency_p50_ms", "latency_p95_ms", "latency_p99_ms", "ttfb_p50_ms", "ttfb_p95_ms"):
+        before, after = baseline.get(key), current.get(key)
+        if before:
+            print(f"   {key:<16} {before:>10} → {after:>10}  ({(after - before) / before * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the chatbot API against a stub LLM.")
+    parser.add_argument("--endpoint", choices=["stream", "chat"], default="stream")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--prefill-ms", type=float, default=150.0)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--answer-words", type=int, default=120)
+    parser.add_argument("--answer-cache", action="store_true", help="leave the semantic answer cache on")
+    parser.add_argument("--output", help="write the results as a JSON baseline to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="chatbot-bench-")
+    index_dir = os.path.join(work_dir, "faiss_index")
+    embeddings = OfflineEmbeddings()
+    print(f"📚 Building offline index in {index_dir}")
+    build_offline_index(index_dir, embeddings)
+
+    llm = StubChatModel(prefill_ms=args.prefill_ms, tokens_per_second=args.tokens_per_second, answer_words=args.answer_words)
+    main_module = load_app(index_dir, work_dir, embeddings, llm, answer_cache=args.answer_cache)
+    port = free_port()
+    server, thread = start_server(main_module.app, port)
+
+    path = "/chat/stream" if args.endpoint == "stream" else "/chat"
+    print(f"🚦 {args.requests} requests to {path} at concurrency {args.concurrency}")
+    ask(port, path, HR_QUESTIONS[0], "warmup")
+    results, wall_seconds = replay(port, path, args.requests, args.concurrency)
+
+    server.should_exit = True
+    thread.join(timeout=10)
+    main_module.request_log.close()
+
+    summary = summarize(results, wall_seconds)
+    stages = stage_breakdown(main_module.REQUEST_LOG_PATH)
+    print(f"\n   {summary['ok']}/{summary['requests']} ok, {summary['busy_503']} busy, {summary['errors']} errors, {summary['rps']} req/s")
+    print(f"   latency p50 {summary['latency_p50_ms']}ms  p95 {summary['latency_p95_ms']}ms  p99 {summary['latency_p99_ms']}ms")
+    print(f"   ttfb    p50 {summary['ttfb_p50_ms']}ms  p95 {summary['ttfb_p95_ms']}ms  p99 {summary['ttfb_p99_ms']}ms")
+    print("\n⏱️ Per-stage breakdown")
+    for name, row in stages.items():
+        print(f"   {name:<12} p50 {row['p50_ms']:9.2f}ms  p95 {row['p95_ms']:9.2f}ms  ({row['count']} calls)")
+
+    if args.compare:
+        compare(summary, args.compare)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "summary": summary, "stages": stages}, f, indent=2)
+        print(f"\n💾 Baseline written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
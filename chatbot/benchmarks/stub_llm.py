@@ -0,0 +1,68 @@
+# stub_llm.py - stand-in for the Ollama chat model with a fixed prefill latency and token rate
+
+import time
+import asyncio
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+ANSWER_TEXT = (
+    "According to the policy, employees should submit their request through the HR portal and inform their "
+    "supervisor in advance. The document also notes that approvals depend on workload and that records are kept "
+    "by HR for audit purposes. Please refer to the relevant section of the procedure for the full details."
+)
+
+
+class StubChatModel(BaseChatModel):
+    """Answers every prompt after `prefill_ms`, then emits `answer_words` words at `tokens_per_second`.
+
+    Response metadata mimics Ollama's (prompt_eval_* / eval_*), so the server's usage metrics still work.
+    """
+
+    prefill_ms: float = 150.0
+    tokens_per_second: float = 40.0
+    answer_words: int = 120
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _tokens(self, messages):
+        prompt = " ".join(str(message.content) for message in messages)
+        if "Respond with only" in prompt:
+            # The HR yes/no classifier prompt
+            return ["Yes"], prompt
+        words = ANSWER_TEXT.split()
+        return [words[i % len(words)] + " " for i in range(self.answer_words)], prompt
+
+    def _metadata(self, prompt, n_tokens):
+        return {
+            "model": "stub",
+            "prompt_eval_count": max(1, len(prompt) // 4),
+            "prompt_eval_duration": int(self.prefill_ms * 1e6),
+            "eval_count": n_tokens,
+            "eval_duration": int(n_tokens / self.tokens_per_second * 1e9),
+        }
+
+    def _result(self, tokens, prompt):
+        message = AIMessage(content="".join(tokens).strip(), response_metadata=self._metadata(prompt, len(tokens)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens, prompt = self._tokens(messages)
+        time.sleep(self.prefill_ms / 1000 + len(tokens) / self.tokens_per_second)
+        return self._result(tokens, prompt)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens, prompt = self._tokens(messages)
+        await asyncio.sleep(self.prefill_ms / 1000 + len(tokens) / self.tokens_per_second)
+        return self._result(tokens, prompt)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens, prompt = self._tokens(messages)
+        await asyncio.sleep(self.prefill_ms / 1000)
+        for token in tokens:
+            await asyncio.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        # Like Ollama, the timings arrive on a final empty chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", response_metadata=self._metadata(prompt, len(tokens))))
@@ -0,0 +1,76 @@
+# synthetic.py - offline stand-ins for benchmarks (no model download, no network)
+
+import random
+import hashlib
+import numpy as np
+
+TOPICS = {
+    "leave": ["leave", "annual", "medical", "e-leave", "approval", "supervisor", "days", "entitlement", "apply"],
+    "pantry": ["pantry", "fridge", "clean", "cups", "microwave", "food", "label", "sink", "rules"],
+    "meeting": ["meeting", "etiquette", "agenda", "punctual", "camera", "mute", "client", "minutes", "online"],
+    "laptop": ["laptop", "computer", "password", "software", "install", "return", "damage", "it", "policy"],
+    "quality": ["quality", "manual", "audit", "controlled", "copy", "procedure", "annex", "revision", "iso"],
+    "email": ["email", "webmail", "autoresponder", "signature", "reply", "subject", "attachment", "outlook"],
+    "invoice": ["invoice", "supplier", "abss", "purchase", "xtranet", "import", "module", "payment"],
+    "offboarding": ["offboarding", "clean", "desk", "resignation", "handover", "return", "access", "last"],
+}
+CODES = ["OPS-01", "MMP-01", "PSC-01", "SMQ-01", "SMQ-03", "HRD-01", "CS-01", "MTN-01", "SAL-01", "QP-INDEX"]
+FILLER = ["the", "staff", "should", "must", "please", "ensure", "all", "before", "after", "with", "for", "and", "of", "to"]
+
+
+def synthetic_corpus(n, seed=0, words_per_chunk=120):
+    """`n` chunk-sized texts, each mostly drawn from one topic vocabulary so the vectors cluster like real SOPs."""
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    texts = []
+    for i in range(n):
+        topic = topics[i % len(topics)]
+        words = []
+        for _ in range(words_per_chunk):
+            r = rng.random()
+            if r < 0.45:
+                words.append(rng.choice(TOPICS[topic]))
+            elif r < 0.5:
+                words.append(rng.choice(CODES))
+            elif r < 0.6:
+                words.append(rng.choice(TOPICS[rng.choice(topics)]))
+            else:
+                words.append(rng.choice(FILLER))
+        texts.append(f"{topic.upper()}-{i} " + " ".join(words))
+    return texts
+
+
+def synthetic_questions(n, seed=1):
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(n):
+        topic = rng.choice(list(TOPICS))
+        terms = rng.sample(TOPICS[topic], 3)
+        questions.append(f"what is the {terms[0]} {terms[1]} rule for {terms[2]} under {rng.choice(CODES)}?")
+    return questions
+
+
+class HashingEmbeddings:
+    """Deterministic feature-hashing embedder with the Embeddings interface (embed_documents / embed_query)."""
+
+    def __init__(self, dim=768):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        tokens = text.lower().split()
+        for token in tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]:
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def embed_documents(self, texts):
+        return [self._embed(text).tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text).tolist()
+
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values, dtype=np.float64), q)) if len(values) else float("nan")
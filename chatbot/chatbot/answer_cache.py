@@ -0,0 +1,140 @@
+# answer_cache.py
+
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import numpy as np
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    source_file: str
+    chunk_ids: list
+    vector: np.ndarray = field(repr=False)
+    created_at: float
+    scope: str = ""
+
+
+def normalize_question(question: str) -> str:
+    question = re.sub(r"\s+", " ", question.lower()).strip()
+    return question.rstrip("?!. ")
+
+
+class AnswerCache:
+    """LRU + TTL answer cache keyed by the normalized question, with a nearest-neighbour
+    fallback on the question embedding for paraphrases.
+
+    Entries are dropped as soon as the FAISS index under `index_dir` changes on disk,
+    so a re-ingest never serves answers grounded in the old documents. `scope` (the metadata
+    filter the question was retrieved with) is part of the key: a paraphrase only matches
+    an answer retrieved under the same filter.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity_threshold: float, index_dir: str):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.index_dir = index_dir
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self._entries = OrderedDict()
+        self._matrix = None
+        self._matrix_keys = []
+        self._matrix_scopes = None
+        self._index_fingerprint = self._fingerprint()
+        self._lock = threading.Lock()
+
+    def _fingerprint(self):
+        try:
+            stat = os.stat(os.path.join(self.index_dir, "index.faiss"))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _check_index(self):
+        fingerprint = self._fingerprint()
+        if fingerprint != self._index_fingerprint:
+            self._index_fingerprint = fingerprint
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+            self._matrix = None
+
+    def _expired(self, entry: CachedAnswer) -> bool:
+        return self.ttl_seconds and time.time() - entry.created_at > self.ttl_seconds
+
+    def _remove_expired(self):
+        expired = [key for key, entry in self._entries.items() if self._expired(entry)]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def _nearest(self, vector, scope):
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries)
+            if not self._matrix_keys:
+                return None, 0.0
+            self._matrix = np.stack([self._entries[k].vector for k in self._matrix_keys])
+            self._matrix_scopes = np.array([self._entries[k].scope for k in self._matrix_keys], dtype=object)
+        similarities = np.where(self._matrix_scopes == scope, self._matrix @ vector, -np.inf)
+        best = int(np.argmax(similarities))
+        if not np.isfinite(similarities[best]):
+            return None, 0.0
+        return self._matrix_keys[best], float(similarities[best])
+
+    def get(self, question: str, vector_fn, scope: str = ""):
+        """Return a CachedAnswer or None. `vector_fn()` is only called when there is no exact match."""
+        key = (scope, normalize_question(question))
+        with self._lock:
+            self._check_index()
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry):
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry
+
+        vector = _unit(vector_fn())
+        with self._lock:
+            # The index may have been swapped while the question was being embedded
+            self._check_index()
+            self._remove_expired()
+            nearest_key, similarity = self._nearest(vector, scope)
+            if nearest_key is not None and similarity >= self.similarity_threshold:
+                self._entries.move_to_end(nearest_key)
+                self.stats["semantic_hits"] += 1
+                return self._entries[nearest_key]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, question: str, vector, answer: str, source_file, chunk_ids, scope: str = ""):
+        key = (scope, normalize_question(question))
+        entry = CachedAnswer(answer, source_file, list(chunk_ids), _unit(vector), time.time(), scope)
+        with self._lock:
+            self._check_index()
+            self._remove_expired()
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            self._matrix = None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.stats["exact_hits"] + self.stats["semantic_hits"] + self.stats["misses"]
+            hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "similarity_threshold": self.similarity_threshold,
+            }
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
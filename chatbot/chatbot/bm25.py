@@ -0,0 +1,184 @@
+# bm25.py
+
+import os
+import re
+import math
+from collections import Counter
+import numpy as np
+
+BM25_FILE = "bm25.npz"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_SPLIT_RE = re.compile(r"[-_./]")
+
+
+def tokenize(text: str):
+    """Lowercase word tokens that keep document codes intact.
+
+    "MMP-01-ANNEX II" -> mmp-01-annex, mmp-01, mmp, 01, annex, ii: the full code, its leading
+    prefixes and its parts, so a query for "MMP-01" matches both the code and its annexes.
+    """
+    tokens = []
+    for match in _TOKEN_RE.findall(text.lower()):
+        tokens.append(match)
+        parts = _SPLIT_RE.split(match)
+        if len(parts) > 1:
+            tokens.extend("-".join(parts[:i]) for i in range(2, len(parts)))
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings, k=60, weights=None):
+    """Fuse ranked ID lists: score(id) = sum(weight / (k + rank)). Returns [(id, score)] best first."""
+    weights = weights or [1.0] * len(rankings)
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """Okapi BM25 over chunk IDs, backed by flat numpy arrays.
+
+    A forward index (row -> term IDs/frequencies, CSR) is what gets added to and saved; the inverted
+    index (term -> rows/frequencies, CSR) is rebuilt from it with one argsort whenever rows were added
+    or deleted, so incremental updates never re-tokenize existing chunks.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab = {}
+        self.doc_ids = []
+        self.row_of = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.fwd_indptr = np.zeros(1, dtype=np.int64)
+        self.fwd_terms = np.zeros(0, dtype=np.int32)
+        self.fwd_tfs = np.zeros(0, dtype=np.float32)
+        self._inverted = None
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    def add(self, ids, texts):
+        indptr, terms, tfs, lengths = [], [], [], []
+        offset = int(self.fwd_indptr[-1])
+        for doc_id, text in zip(ids, texts):
+            if doc_id in self.row_of:
+                self.delete([doc_id])
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                terms.append(self.vocab.setdefault(term, len(self.vocab)))
+                tfs.append(tf)
+            offset += len(counts)
+            indptr.append(offset)
+            lengths.append(sum(counts.values()))
+            self.row_of[doc_id] = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+
+        self.fwd_indptr = np.concatenate([self.fwd_indptr, np.asarray(indptr, dtype=np.int64)])
+        self.fwd_terms = np.concatenate([self.fwd_terms, np.asarray(terms, dtype=np.int32)])
+        self.fwd_tfs = np.concatenate([self.fwd_tfs, np.asarray(tfs, dtype=np.float32)])
+        self.doc_len = np.concatenate([self.doc_len, np.asarray(lengths, dtype=np.float32)])
+        self.alive = np.concatenate([self.alive, np.ones(len(lengths), dtype=bool)])
+        self._inverted = None
+
+    def delete(self, ids):
+        for doc_id in ids:
+            row = self.row_of.pop(doc_id, None)
+            if row is not None:
+                self.alive[row] = False
+        self._inverted = None
+
+    def compact(self):
+        """Drop deleted rows from the forward index (done before saving)."""
+        if self.alive.all():
+            return
+        keep = np.flatnonzero(self.alive)
+        counts = np.diff(self.fwd_indptr)[keep]
+        starts = self.fwd_indptr[:-1][keep]
+        positions = np.concatenate([np.arange(s, s + c) for s, c in zip(starts, counts)]) if len(keep) else np.zeros(0, dtype=np.int64)
+        self.fwd_terms = self.fwd_terms[positions]
+        self.fwd_tfs = self.fwd_tfs[positions]
+        self.fwd_indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.doc_len = self.doc_len[keep]
+        self.doc_ids = [self.doc_ids[row] for row in keep]
+        self.row_of = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+        self.alive = np.ones(len(keep), dtype=bool)
+        self._inverted = None
+
+    def _build_inverted(self):
+        rows = np.repeat(np.arange(len(self.doc_ids), dtype=np.int32), np.diff(self.fwd_indptr))
+        mask = self.alive[rows] if len(rows) else np.zeros(0, dtype=bool)
+        rows, terms, tfs = rows[mask], self.fwd_terms[mask], self.fwd_tfs[mask]
+        order = np.argsort(terms, kind="stable")
+        inv_indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self.vocab)), out=inv_indptr[1:])
+        live_lengths = self.doc_len[self.alive]
+        self._inverted = (inv_indptr, rows[order], tfs[order], max(float(live_lengths.mean()), 1.0) if len(live_lengths) else 1.0)
+
+    def search(self, query: str, k: int, allowed_rows=None):
+        """Top-k (chunk ID, score). `allowed_rows` is an optional boolean mask over rows (metadata filter)."""
+        if self._inverted is None:
+            self._build_inverted()
+        inv_indptr, inv_rows, inv_tfs, avgdl = self._inverted
+        n_docs = len(self)
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids or not n_docs:
+            return []
+
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        for term_id in term_ids:
+            start, end = inv_indptr[term_id], inv_indptr[term_id + 1]
+            if start == end:
+                continue
+            rows, tf = inv_rows[start:end], inv_tfs[start:end]
+            df = end - start
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[rows] / avgdl)
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if allowed_rows is not None:
+            scores[~allowed_rows] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.doc_ids[row], float(scores[row])) for row in candidates]
+
+    def save(self, directory):
+        self.compact()
+        terms = sorted(self.vocab, key=self.vocab.get)
+        path = os.path.join(directory, BM25_FILE)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            params=np.asarray([self.k1, self.b], dtype=np.float64),
+            vocab=np.asarray(terms, dtype=str),
+            doc_ids=np.asarray(self.doc_ids, dtype=str),
+            doc_len=self.doc_len,
+            fwd_indptr=self.fwd_indptr,
+            fwd_terms=self.fwd_terms,
+            fwd_tfs=self.fwd_tfs,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, directory):
+        with np.load(os.path.join(directory, BM25_FILE), allow_pickle=False) as data:
+            index = cls(*data["params"].tolist())
+            index.vocab = {term: i for i, term in enumerate(data["vocab"].tolist())}
+            index.doc_ids = data["doc_ids"].tolist()
+            index.doc_len = data["doc_len"]
+            index.fwd_indptr = data["fwd_indptr"]
+            index.fwd_terms = data["fwd_terms"]
+            index.fwd_tfs = data["fwd_tfs"]
+        index.row_of = {doc_id: row for row, doc_id in enumerate(index.doc_ids)}
+        index.alive = np.ones(len(index.doc_ids), dtype=bool)
+        return index
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, BM25_FILE))
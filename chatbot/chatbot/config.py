@@ -22,5 +22,134 @@ CHUNK_OVERLAP = 200 #100
 PDF_DIR = "data/pdfs"
 CLEANED_DIR = "data/Cleaned"
 
+# 📑 Ingest Sources
+# "cleaned": only the hand-made copies in CLEANED_DIR
+# "originals": DOCX/PDF parsed straight from PDF_DIR
+# "both": CLEANED_DIR, plus any original in PDF_DIR that has no cleaned copy yet
+INGEST_SOURCES = "both"
+EXTRACTION_CACHE_DIR = "models/extraction_cache"  # extracted text per content hash; originals are parsed once
+
 # 📝 Answer Control
 MAX_ANSWER_WORDS = 300
+
+# 🚦 LLM Concurrency (requests beyond running + queued get a 503)
+LLM_MAX_CONCURRENCY = 2
+LLM_MAX_QUEUE = 16
+LLM_QUEUE_TIMEOUT = 60  # seconds a request may wait for a free LLM slot
+
+# 🧭 HR Gate
+# "parallel": skip the LLM classifier when the keyword check already matches, otherwise run it alongside retrieval
+# "serial": original order (keyword check, LLM classifier, then retrieval)
+HR_GATE_MODE = "parallel"
+
+# 🧠 Intent Classifier (embedding centroids; the LLM yes/no gate is only asked inside the uncertain band)
+INTENT_CLASSIFIER_ENABLED = True
+HR_INTENT_LOW = 0.3  # at or below: not HR
+HR_INTENT_HIGH = 0.7  # at or above: HR
+PERSONAL_INTENT_THRESHOLD = 0.75  # reject as personal from the score alone
+PERSONAL_KEYWORD_THRESHOLD = 0.5  # reject when a personal keyword matches and the score agrees
+INTENT_LLM_FALLBACK = True
+
+# ♻️ Answer Cache (cleared automatically when the FAISS index is rebuilt)
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_MAX_ENTRIES = 1000
+ANSWER_CACHE_TTL = 6 * 60 * 60  # seconds
+ANSWER_CACHE_SIMILARITY = 0.95  # cosine similarity for a paraphrased question to reuse an answer
+
+# 🏭 Ingestion Pipeline
+INGEST_WORKERS = os.cpu_count() or 1  # processes for parsing + splitting
+EMBED_BATCH_SIZE = 64
+EMBED_NORMALIZE = True  # unit-length vectors (bge's own sentence-transformers config normalizes too)
+EMBED_MULTI_PROCESS = False  # sentence-transformers multi-process encoding pool
+
+# ⚙️ Embedding Backend (ingest and the server must use the same one; switching needs a re-ingest)
+# "torch": sentence-transformers on PyTorch
+# "onnx": ONNX Runtime on the model exported by chatbot/export_onnx.py (no torch import at all)
+EMBEDDING_BACKEND = "torch"
+ONNX_MODEL_DIR = "models/onnx"
+ONNX_QUANTIZED = True  # int8 dynamic quantization; check recall with benchmarks/bench_embeddings.py first
+ONNX_THREADS = 0  # intra-op threads; 0 = ONNX Runtime's default (one per physical core)
+ONNX_MAX_LENGTH = 512  # tokens per text, same truncation as the torch model
+
+# 🗃️ Embedding Cache (on-disk, keyed by model + chunk/question text)
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_DIR = "models/embedding_cache"
+EMBEDDING_QUERY_CACHE_MAX_ROWS = 20000  # question vectors kept by the server; the file starts afresh past this
+
+# 🗂️ FAISS Index: "flat" (exact), "ivf_flat", "hnsw" or "ivf_pq"
+FAISS_INDEX_TYPE = "flat"
+IVF_NLIST = 1024  # clusters; capped at ~n/39 for small corpora
+IVF_NPROBE = 16  # clusters scanned per query
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+PQ_M = 16  # sub-quantizers, must divide the embedding dimension (768 for bge-base)
+PQ_NBITS = 8
+
+# 🧊 Vector Store Loading
+# "pickle": load_chain() reads index.faiss + index.pkl into each worker's memory
+# "mmap": index.faiss is memory-mapped read-only and chunks are fetched lazily from docstore.sqlite
+VECTORSTORE_LOAD_MODE = "pickle"
+
+# 🔤 Hybrid Retrieval (BM25 over the same chunks, fused with the dense results by reciprocal rank)
+HYBRID_SEARCH_ENABLED = True
+HYBRID_CANDIDATES = 20  # taken from each retriever before fusion
+RRF_K = 60
+HYBRID_DENSE_WEIGHT = 1.0
+HYBRID_SPARSE_WEIGHT = 1.0
+
+# 🏷️ Metadata Pre-filtering (restricts the vector/BM25 search to matching chunks before top-k)
+METADATA_FILTER_FIELDS = ["doc_type", "source"]  # add e.g. "country"/"department" once ingest tags them
+
+# 🎯 Reranking (cross-encoder over a wider candidate set; falls back to FAISS order when over budget)
+RERANK_ENABLED = False
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_CANDIDATES = 30
+RERANK_TOP_N = 3
+RERANK_BATCH_SIZE = 16
+RERANK_BUDGET_MS = 250
+
+# 🧱 Context Packing (merge overlapping chunks, drop repeated sentences, enforce a token budget)
+CONTEXT_PACKING_ENABLED = True
+CONTEXT_MAX_TOKENS = 1200
+CONTEXT_TOKENIZER = None  # HF tokenizer matching the Ollama model (e.g. "meta-llama/Llama-3.2-3B-Instruct"); None = ~4 chars/token
+
+# 🧩 Prompt Layering (fixed system message + cached context block + user turn)
+OLLAMA_KEEP_ALIVE = "30m"  # keep the model (and its cached system-prompt prefix) resident between requests
+CONTEXT_BLOCK_CACHE_SIZE = 256  # context blocks remembered per chunk-ID set
+
+# 📦 Query Micro-batching (concurrent questions share one embedding pass and one FAISS search)
+QUERY_BATCHING_ENABLED = True
+QUERY_BATCH_MAX_SIZE = 16
+QUERY_BATCH_MAX_WAIT_MS = 5  # how long the first question in a batch waits for company
+
+# 💬 Conversation Sessions (per-browser-tab history for follow-up questions)
+SESSION_MAX_TURNS = 10  # ring buffer per session
+SESSION_CONTEXT_TURNS = 2  # earlier turns sent to the LLM with a follow-up question
+SESSION_IDLE_SECONDS = 30 * 60
+SESSION_MAX_SESSIONS = 5000
+SESSION_MAX_BYTES = 50 * 1024 * 1024  # global cap on history held in memory
+SESSION_DB_PATH = None  # e.g. "models/sessions.sqlite" to share sessions across workers and restarts
+
+# 📝 Request Log (JSON lines written by a background thread, replaces question_log.txt)
+REQUEST_LOG_PATH = "logs/requests.jsonl"
+REQUEST_LOG_MAX_BYTES = 10 * 1024 * 1024  # rotate to requests.jsonl.1 .. .N past this size
+REQUEST_LOG_BACKUPS = 5
+REQUEST_LOG_FLUSH_INTERVAL = 1.0  # seconds
+
+# 🔤 Keyword Screening (HR / personal keywords and rejection-tone patterns; edit the JSON, not the code)
+KEYWORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "keywords.json")
+HR_FUZZY_THRESHOLD = 80  # rapidfuzz partial_ratio needed for a fuzzy keyword hit
+
+# 📌 Index Snapshots (ingest writes models/faiss_index/versions/<stamp> and flips models/faiss_index/CURRENT)
+INDEX_SNAPSHOTS_KEEP = 3  # the server may still be reading the previous version until it reloads
+INDEX_RELOAD_POLL_SECONDS = 10  # how often the server checks CURRENT; 0 = only on POST /admin/reload
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # /admin/* requires a matching X-Admin-Token header and is disabled while unset
+
+# 🔥 Serving (serve.py loads everything once, then forks workers that share it copy-on-write)
+SERVE_HOST = "0.0.0.0"
+SERVE_PORT = 8000
+SERVE_WORKERS = 4
+WARMUP_QUESTION = "How do I apply for annual leave?"  # embedded, searched and sent to the LLM before /ready
+WARMUP_LLM_PING = True  # one-token LLM call at startup; /ready stays 503 until Ollama answers
+WARMUP_RETRY_SECONDS = 10
@@ -0,0 +1,117 @@
+# context_builder.py
+
+import re
+
+_SENTENCE_SPLIT_RE = re.compile(r"((?<=[.!?])\s+|\n+)")
+MIN_OVERLAP_CHARS = 20
+
+
+def _overlap(a: str, b: str, max_chars: int) -> int:
+    """Length of the longest suffix of `a` that is also a prefix of `b` (0 if under MIN_OVERLAP_CHARS)."""
+    for n in range(min(len(a), len(b), max_chars), MIN_OVERLAP_CHARS - 1, -1):
+        if b.startswith(a[-n:]):
+            return n
+    return 0
+
+
+class ContextBuilder:
+    """Turns retrieved chunks into a compact prompt context.
+
+    1. Chunks from the same `source` are grouped and neighbouring chunks merged, so the
+       splitter's overlap is sent once instead of twice.
+    2. Sentences already emitted (by any chunk) are dropped.
+    3. If the rest exceeds `max_tokens`, sentences are kept in relevance order (the rank of the
+       best-ranked chunk they came from) until the budget is reached, so the least relevant
+       chunks are what gets cut. The kept sentences are then written out in reading order.
+    """
+
+    def __init__(self, max_tokens: int, max_overlap_chars: int, tokenizer_name: str = None):
+        self.max_tokens = max_tokens
+        self.max_overlap_chars = max_overlap_chars
+        self._tokenizer = None
+        if tokenizer_name:
+            from tokenizers import Tokenizer
+
+            self._tokenizer = Tokenizer.from_pretrained(tokenizer_name)
+
+    def count_tokens(self, text: str) -> int:
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+        # No tokenizer configured: ~4 characters per token is close enough for English prose
+        return max(1, len(text) // 4)
+
+    def _merge_group(self, ranked_docs):
+        """Merged segments as (text, spans); each span (start, end, rank) is where a chunk's text lies."""
+        ordered = sorted(
+            ranked_docs,
+            key=lambda item: (item[1].metadata.get("chunk_index") is None, item[1].metadata.get("chunk_index", 0), item[0]),
+        )
+        segments = []
+        previous_index = None
+        for rank, doc in ordered:
+            text = doc.page_content.strip()
+            index = doc.metadata.get("chunk_index")
+            if segments:
+                merged, spans = segments[-1]
+                n = _overlap(merged, text, self.max_overlap_chars)
+                adjacent = index is not None and previous_index is not None and index == previous_index + 1
+                if n or adjacent:
+                    # The shared overlap belongs to both chunks
+                    start = len(merged) - n if n else len(merged) + 1
+                    merged += text[n:] if n else "\n" + text
+                    spans.append((start, len(merged), rank))
+                    segments[-1] = (merged, spans)
+                    previous_index = index
+                    continue
+            segments.append((text, [(0, len(text), rank)]))
+            previous_index = index
+        return segments
+
+    def build(self, docs_and_scores) -> str:
+        # Group by source in order of each source's best-ranked chunk
+        groups = {}
+        for rank, (doc, _) in enumerate(docs_and_scores):
+            groups.setdefault(doc.metadata.get("source"), []).append((rank, doc))
+
+        # Lay out the deduplicated sentences in reading order: [rank, block, sentence, separator]
+        sentences = []
+        seen = {}
+        block = 0
+        for ranked_docs in groups.values():
+            for text, spans in self._merge_group(ranked_docs):
+                # Split keeps the separators, so line breaks (lists, headings) survive the rebuild
+                pieces = _SENTENCE_SPLIT_RE.split(text)
+                position = 0
+                for i in range(0, len(pieces), 2):
+                    start, end = position, position + len(pieces[i])
+                    position = end + (len(pieces[i + 1]) if i + 1 < len(pieces) else 0)
+                    sentence = pieces[i].strip()
+                    separator = "\n" if i + 1 < len(pieces) and "\n" in pieces[i + 1] else " "
+                    key = re.sub(r"\s+", " ", sentence.lower())
+                    if not key:
+                        continue
+                    rank = min(r for s, e, r in spans if s < end and e > start)
+                    if key in seen:
+                        # Emitted once, at its first place, but as relevant as its best-ranked copy
+                        entry = sentences[seen[key]]
+                        entry[0] = min(entry[0], rank)
+                        continue
+                    seen[key] = len(sentences)
+                    sentences.append([rank, block, sentence, separator])
+                block += 1
+
+        # Keep sentences by relevance until the budget is spent; stop at the first that does not fit
+        kept = set()
+        used_tokens = 0
+        for i in sorted(range(len(sentences)), key=lambda i: (sentences[i][0], i)):
+            tokens = self.count_tokens(sentences[i][2])
+            if used_tokens + tokens > self.max_tokens:
+                break
+            used_tokens += tokens
+            kept.add(i)
+
+        blocks = {}
+        for i in sorted(kept):
+            _, block, sentence, separator = sentences[i]
+            blocks.setdefault(block, []).append(sentence + separator)
+        return "\n".join("".join(parts).strip() for parts in blocks.values())
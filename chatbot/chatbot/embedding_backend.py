@@ -0,0 +1,126 @@
+# embedding_backend.py
+
+import os
+import json
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+ONNX_CONFIG_FILE = "embedding_config.json"
+
+
+def backend_label(backend, quantized=False):
+    """Short name of the backend ("torch", "onnx" or "onnx-int8") for the ingest manifest and cache keys."""
+    if backend == "onnx":
+        return "onnx-int8" if quantized else "onnx"
+    return "torch"
+
+
+def cache_model_id(model_name, backend, quantized=False, normalize=True):
+    """EmbeddingCache ID shared by ingest and the server, so question and chunk vectors come from one cache."""
+    # ONNX (int8 especially) vectors differ slightly from the torch ones, so each backend caches separately
+    label = backend_label(backend, quantized)
+    model_id = model_name if label == "torch" else f"{model_name}|{label}"
+    return f"{model_id}|normalize={normalize}"
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings from a model exported by export_onnx.py, run with ONNX Runtime on CPU.
+
+    Tokenization uses the Rust `tokenizers` package, so neither torch nor sentence-transformers is
+    imported. Pooling (CLS for bge) and normalization match what HuggingFaceEmbeddings produces.
+    """
+
+    def __init__(self, model_dir, model_name=None, quantized=True, normalize=True, batch_size=32, max_length=512, threads=0):
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), encoding="utf-8") as f:
+            config = json.load(f)
+        if model_name and config["model"] != model_name:
+            raise ValueError(f"{model_dir} holds an export of {config['model']}, not {model_name}; re-run export_onnx.py")
+        self.pooling = config["pooling"]
+        self.normalize = normalize
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        pad_token = config.get("pad_token", "[PAD]")
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+
+        self._path = os.path.join(model_dir, ONNX_INT8_FILE if quantized else ONNX_FILE)
+        self._threads = threads
+        self._open_session()
+
+    def _open_session(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self._threads:
+            options.intra_op_num_threads = self._threads
+        self.session = ort.InferenceSession(self._path, options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        self._pid = os.getpid()
+
+    def _forward(self, texts):
+        if self._pid != os.getpid():
+            # ONNX Runtime's thread pool does not survive a fork, so each serve.py worker opens its own session
+            self._open_session()
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {"input_ids": np.array([e.ids for e in encodings], dtype=np.int64), "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feed["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(None, feed)[0]
+        if self.pooling == "cls":
+            vectors = hidden[:, 0]
+        else:
+            weights = mask[:, :, None].astype(np.float32)
+            vectors = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        if self.normalize:
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors.astype(np.float32)
+
+    def _encode(self, texts):
+        if not texts:
+            return []
+        # Similar lengths share a batch, so little of each forward pass is spent on padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            for i, vector in zip(rows, self._forward([texts[i] for i in rows])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_documents(self, texts):
+        return self._encode(list(texts))
+
+    def embed_query(self, text):
+        return self._encode([text])[0]
+
+    def embed_queries(self, texts):
+        return self._encode(list(texts))
+
+
+def load_embedding_model(backend, model_name, normalize=True, batch_size=32, multi_process=False,
+                         onnx_dir=None, quantized=True, max_length=512, threads=0):
+    """The embedding model for ingest and for encoding questions (both sides must use the same one).
+
+    "torch" is sentence-transformers through HuggingFaceEmbeddings; "onnx" is OnnxEmbeddings.
+    """
+    if backend == "onnx":
+        return OnnxEmbeddings(onnx_dir, model_name, quantized, normalize, batch_size, max_length, threads)
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    class TorchEmbeddings(HuggingFaceEmbeddings):
+        def embed_queries(self, texts):
+            # HuggingFaceEmbeddings.embed_query is embed_documents([text])[0], so queries batch the same way
+            return self.embed_documents(list(texts))
+
+    return TorchEmbeddings(
+        model_name=model_name,
+        encode_kwargs={"batch_size": batch_size, "normalize_embeddings": normalize},
+        multi_process=multi_process,
+    )
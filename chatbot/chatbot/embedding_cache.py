@@ -0,0 +1,222 @@
+# embedding_cache.py
+
+import os
+import re
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+KEY_BYTES = 20  # sha1 digest
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by sha1(model ID, kind, text).
+
+    Rows live in one append-only file of fixed-size records (20-byte key + float32 vector) that is
+    memory-mapped for reads; the key -> row offset index is rebuilt from it on open. Several processes
+    (uvicorn workers, ingest.py) share the file: appends are serialized by a lock file, and the writer
+    holding it first cuts off any partial record a crashed writer left behind, so later records always
+    start on a record boundary. Readers never lock; they only map whole records.
+
+    `name` selects the file, so the server's question vectors live apart from ingest's chunk vectors.
+    With `max_rows` the file is started afresh once it would grow past that many records.
+    """
+
+    def __init__(self, base_dir: str, model_id: str, name: str = "vectors", max_rows: int = 0):
+        self.model_id = model_id
+        self.max_rows = max_rows
+        self.directory = os.path.join(base_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_id))
+        os.makedirs(self.directory, exist_ok=True)
+        self._records_path = os.path.join(self.directory, f"{name}.bin")
+        self._lock_path = os.path.join(self.directory, f"{name}.lock")
+        self._meta_path = os.path.join(self.directory, "meta.json")
+        self.dim = None
+        self.hits = 0
+        self.misses = 0
+        self._offsets = {}
+        self._rows = 0
+        self._records = None
+        self._file_id = None
+        self._lock = threading.Lock()
+        if self._load_meta():
+            with self._lock, self._file_lock():
+                self._trim_torn_tail()
+                self._refresh()
+
+    def _load_meta(self):
+        """Pick up the vector size once some process has written the first rows."""
+        if self.dim is None and os.path.exists(self._meta_path):
+            with open(self._meta_path, encoding="utf-8") as f:
+                self._set_dim(json.load(f)["dim"])
+        return self.dim is not None
+
+    def _set_dim(self, dim):
+        self.dim = dim
+        self._dtype = np.dtype([("key", f"S{KEY_BYTES}"), ("vector", "<f4", (dim,))])
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive across processes; held while appending, trimming or starting the file afresh."""
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            yield
+        finally:
+            os.close(fd)  # releases the lock
+
+    def _trim_torn_tail(self):
+        try:
+            size = os.path.getsize(self._records_path)
+        except FileNotFoundError:
+            return
+        if size % self._dtype.itemsize:
+            # A writer died mid-record; appending after it would shift every later record
+            os.truncate(self._records_path, size - size % self._dtype.itemsize)
+
+    def _start_afresh(self):
+        self._records = None  # Windows cannot remove a file this process still maps
+        try:
+            os.remove(self._records_path)
+        except FileNotFoundError:
+            pass
+        except PermissionError:
+            # Still mapped by another process (Windows); try again on the next write
+            return
+        self._refresh()
+
+    def _refresh(self):
+        """Map any rows appended since the last look (by this or another process)."""
+        if not self._load_meta():
+            return
+        try:
+            stat = os.stat(self._records_path)
+        except FileNotFoundError:
+            stat = None
+        file_id = (stat.st_dev, stat.st_ino) if stat is not None else None
+        if file_id != self._file_id:
+            # First look, or the file was started afresh (max_rows): forget the old rows
+            self._file_id = file_id
+            self._offsets = {}
+            self._rows = 0
+            self._records = None
+        if stat is None:
+            return
+        rows = stat.st_size // self._dtype.itemsize
+        if rows == self._rows and self._records is not None:
+            return
+        self._records = np.memmap(self._records_path, dtype=self._dtype, mode="r", shape=(rows,)) if rows else None
+        if rows:
+            for row, key in enumerate(self._records["key"][self._rows:rows], start=self._rows):
+                self._offsets.setdefault(bytes(key), row)
+        self._rows = rows
+
+    def key(self, text: str, kind: str) -> bytes:
+        return hashlib.sha1(f"{self.model_id}\0{kind}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, texts, kind="document"):
+        keys = [self.key(text, kind) for text in texts]
+        with self._lock:
+            if any(key not in self._offsets for key in keys):
+                self._refresh()
+            results = []
+            for key in keys:
+                row = self._offsets.get(key)
+                results.append(None if row is None else np.array(self._records["vector"][row]))
+            found = sum(r is not None for r in results)
+            self.hits += found
+            self.misses += len(results) - found
+            return results
+
+    def put_many(self, texts, vectors, kind="document"):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        with self._lock:
+            if self.dim is None:
+                self._set_dim(int(vectors.shape[1]))
+                # Other processes may be polling for it, so it appears whole or not at all
+                tmp_path = f"{self._meta_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"model_id": self.model_id, "dim": self.dim}, f)
+                os.replace(tmp_path, self._meta_path)
+            records = np.empty(len(texts), dtype=self._dtype)
+            records["key"] = [self.key(text, kind) for text in texts]
+            records["vector"] = vectors
+            with self._file_lock():
+                self._trim_torn_tail()
+                self._refresh()
+                if self.max_rows and self._rows + len(records) > self.max_rows:
+                    self._start_afresh()
+                fd = os.open(self._records_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+                try:
+                    data = records.tobytes()
+                    while data:
+                        data = data[os.write(fd, data):]
+                finally:
+                    os.close(fd)
+                self._refresh()
+
+
+def encode_queries(embeddings, texts):
+    """Batch equivalent of embed_query. Models without their own embed_queries are called once per
+    text: embed_documents would skip the query instruction of models like BGE."""
+    batch = getattr(embeddings, "embed_queries", None)
+    if batch is not None:
+        return batch(texts)
+    return [embeddings.embed_query(text) for text in texts]
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an Embeddings model so only texts missing from the EmbeddingCache reach the model.
+
+    `embeddings` may also be a zero-argument factory; the model is then only loaded on the first miss.
+    Question vectors go to `query_cache` when one is given (the server caps it), else to `cache`.
+    """
+
+    def __init__(self, embeddings, cache: EmbeddingCache, query_cache: EmbeddingCache = None):
+        self._embeddings = embeddings
+        self.cache = cache
+        self.query_cache = query_cache or cache
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def embeddings(self):
+        if not isinstance(self._embeddings, Embeddings):
+            self._embeddings = self._embeddings()
+        return self._embeddings
+
+    def _embed(self, texts, kind, encode):
+        cache = self.query_cache if kind == "query" else self.cache
+        vectors = cache.get_many(texts, kind)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        if missing:
+            fresh = encode(missing)
+            cache.put_many(missing, fresh, kind)
+            by_text = dict(zip(missing, fresh))
+            vectors = [by_text[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return [np.asarray(vector, dtype=np.float32).tolist() for vector in vectors]
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts), "document", self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed([text], "query", lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+    def embed_queries(self, texts):
+        """Several queries in one forward pass (what embed_query would return for each)."""
+        return self._embed(list(texts), "query", lambda missing: encode_queries(self.embeddings, missing))
@@ -0,0 +1,89 @@
+# export_onnx.py - exports the embedding model for EMBEDDING_BACKEND = "onnx"
+#
+#   cd chatbot
+#   python chatbot/export_onnx.py
+#   python benchmarks/bench_embeddings.py   # recall of the int8 model against the fp32 index
+#
+# Writes model.onnx (fp32), model_int8.onnx (int8 dynamic quantization), tokenizer.json and
+# embedding_config.json to ONNX_MODEL_DIR. Only this script needs torch; the server does not.
+
+import os
+import json
+import time
+import argparse
+from config import EMBEDDING_MODEL_NAME, ONNX_MODEL_DIR
+from embedding_backend import ONNX_FILE, ONNX_INT8_FILE, ONNX_CONFIG_FILE
+
+
+def export(model_name, output_dir, opset=17, quantize=True):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0]
+    pooling = model[1].get_pooling_mode_str()
+    if pooling not in ("cls", "mean"):
+        raise ValueError(f"{model_name} uses {pooling} pooling; OnnxEmbeddings supports cls and mean")
+
+    class HiddenStates(torch.nn.Module):
+        # Last hidden state only; pooling and normalization happen in OnnxEmbeddings
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.auto_model(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            )[0]
+
+    sample = transformer.tokenizer(["An example sentence for tracing."], return_tensors="pt")
+    token_type_ids = sample.get("token_type_ids", torch.zeros_like(sample["input_ids"]))
+    fp32_path = os.path.join(output_dir, ONNX_FILE)
+    started = time.perf_counter()
+    with torch.no_grad():
+        torch.onnx.export(
+            HiddenStates(transformer.auto_model).eval(),
+            (sample["input_ids"], sample["attention_mask"], token_type_ids),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "token_type_ids": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=opset,
+        )
+    print(f"📤 Exported {model_name} to {fp32_path} in {time.perf_counter() - started:.1f}s")
+
+    transformer.tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "model": model_name,
+            "pooling": pooling,
+            "dim": model.get_sentence_embedding_dimension(),
+            "max_seq_length": model.max_seq_length,
+            "pad_token": transformer.tokenizer.pad_token,
+        }, f, indent=2)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        int8_path = os.path.join(output_dir, ONNX_INT8_FILE)
+        # Weights to int8, activations quantized on the fly: no calibration set needed
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"🗜️ Quantized to {int8_path} "
+              f"({os.path.getsize(fp32_path) / 2**20:.0f} MB → {os.path.getsize(int8_path) / 2**20:.0f} MB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX (and int8) for the onnx backend.")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--output-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--no-quantize", action="store_true", help="only write the fp32 model")
+    args = parser.parse_args()
+    export(args.model, args.output_dir, args.opset, quantize=not args.no_quantize)
+    print("✅ Export complete. Re-ingest after switching EMBEDDING_BACKEND, the vectors differ slightly.")
@@ -0,0 +1,85 @@
+# extract.py
+
+import os
+from docx import Document
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+# Bump when the extractors change, so cached text from the old ones is not reused
+EXTRACTOR_VERSION = 1
+EXTRACTABLE = (".docx", ".pdf", ".txt")
+
+
+def _row_text(row):
+    cells = []
+    for cell in row.cells:
+        text = " ".join(cell.text.split())
+        # A merged cell is returned once per grid column it spans
+        if text and (not cells or cells[-1] != text):
+            cells.append(text)
+    return " | ".join(cells)
+
+
+def read_docx(path):
+    """Paragraphs and tables in document order; each table row becomes one "a | b | c" line."""
+    doc = Document(path)
+    blocks = []
+    for child in doc.element.body.iterchildren():
+        if child.tag.endswith("}p"):
+            blocks.append(Paragraph(child, doc).text)
+        elif child.tag.endswith("}tbl"):
+            rows = [_row_text(row) for row in Table(child, doc).rows]
+            blocks.append("\n".join(row for row in rows if row))
+    return "\n".join(blocks)
+
+
+def read_pdf(path):
+    from pypdf import PdfReader
+
+    pages = [page.extract_text() or "" for page in PdfReader(path).pages]
+    return "\n\n".join(page.strip() for page in pages if page.strip())
+
+
+def extract_text(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".docx":
+        return read_docx(path)
+    if ext == ".pdf":
+        return read_pdf(path)
+    if ext == ".txt":
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    raise ValueError(f"Cannot extract text from {path}")
+
+
+class ExtractionCache:
+    """Extracted text on disk, one file per content hash: an unchanged original is parsed once,
+    however often the index is rebuilt. Writes are atomic, so ingest's worker processes can share it."""
+
+    def __init__(self, directory):
+        self.directory = os.path.join(directory, f"v{EXTRACTOR_VERSION}")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, file_hash):
+        return os.path.join(self.directory, f"{file_hash}.txt")
+
+    def get(self, file_hash):
+        try:
+            with open(self._path(file_hash), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, file_hash, text):
+        tmp_path = f"{self._path(file_hash)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, self._path(file_hash))
+
+    def extract(self, path, file_hash):
+        """Text of `path` (whose sha256 is `file_hash`), from the cache when it has been parsed before."""
+        text = self.get(file_hash)
+        if text is None:
+            text = extract_text(path)
+            self.put(file_hash, text)
+        return text
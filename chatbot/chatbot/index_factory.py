@@ -0,0 +1,71 @@
+# index_factory.py
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# faiss wants roughly this many training points per IVF centroid / PQ code
+MIN_POINTS_PER_CENTROID = 39
+
+
+def build_index(vectors, index_type="flat", nlist=1024, hnsw_m=32, ef_construction=200, pq_m=16, pq_nbits=8):
+    """Create an empty (but trained) L2 index for `vectors`; the caller adds the vectors.
+
+    IVF cluster counts are capped for small corpora and IVF-PQ falls back to IVF-Flat when there
+    is not enough data to train the codebooks, so a small test corpus still builds.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim)
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        return index
+
+    nlist = max(1, min(nlist, n // MIN_POINTS_PER_CENTROID))
+    quantizer = faiss.IndexFlatL2(dim)
+
+    if index_type == "ivf_pq":
+        if dim % pq_m != 0:
+            raise ValueError(f"PQ_M={pq_m} must divide the embedding dimension {dim}")
+        if n >= (1 << pq_nbits) * MIN_POINTS_PER_CENTROID:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_nbits)
+            index.train(vectors)
+            return index
+        print(f"⚠️ Only {n} vectors, too few to train IVF-PQ codebooks; using IVF-Flat instead.")
+
+    index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+    index.train(vectors)
+    return index
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """Apply query-time knobs (IVF nprobe, HNSW efSearch) to a built or loaded index."""
+    index = faiss.downcast_index(index)
+    if nprobe and isinstance(index, faiss.IndexIVF):
+        index.nprobe = nprobe
+    if ef_search and isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+    return index
+
+
+def supports_removal(index) -> bool:
+    # Only flat indexes compact their ids on remove_ids the way LangChain's FAISS.delete expects.
+    # IVF keeps the old ids (the docstore mapping drifts) and HNSW graphs cannot drop vectors at all.
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+
+
+def describe(index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        return f"{type(index).__name__}(nlist={index.nlist}, nprobe={index.nprobe}, ntotal={index.ntotal})"
+    if isinstance(index, faiss.IndexHNSW):
+        return f"{type(index).__name__}(efSearch={index.hnsw.efSearch}, ntotal={index.ntotal})"
+    return f"{type(index).__name__}(ntotal={index.ntotal})"
@@ -0,0 +1,74 @@
+# index_snapshots.py
+
+import os
+import shutil
+from datetime import datetime
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+
+
+def current_version(root):
+    """Name of the published snapshot under `root`, or None for the old single-directory layout."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def current_index_dir(root):
+    version = current_version(root)
+    return os.path.join(root, VERSIONS_DIR, version) if version else root
+
+
+def new_version_dir(root):
+    path = os.path.join(root, VERSIONS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S-%f"))
+    os.makedirs(path)
+    return path
+
+
+def clone_version(root, source_dir, skip=()):
+    """New version directory holding the files of `source_dir` (hard links where possible), minus `skip`.
+
+    For runs that only change the small metadata files: those are written fresh into the clone, so the
+    published snapshot is never modified in place.
+    """
+    target_dir = new_version_dir(root)
+    for name in os.listdir(source_dir):
+        path = os.path.join(source_dir, name)
+        if name in skip or not os.path.isfile(path):
+            continue
+        try:
+            os.link(path, os.path.join(target_dir, name))
+        except OSError:
+            shutil.copy2(path, os.path.join(target_dir, name))
+    return target_dir
+
+
+def publish(root, version_dir):
+    """Point CURRENT at `version_dir`. The rename is atomic, so readers see the old or the new version, never half of one."""
+    tmp_path = os.path.join(root, CURRENT_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(os.path.basename(version_dir))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(root, CURRENT_FILE))
+
+
+def prune_versions(root, keep):
+    """Delete all but the newest `keep` snapshots (never the current one).
+
+    Older versions are kept for a while because a server may still be answering from one until it reloads.
+    """
+    versions_root = os.path.join(root, VERSIONS_DIR)
+    if not os.path.isdir(versions_root):
+        return []
+    current = current_version(root)
+    versions = sorted(os.listdir(versions_root), reverse=True)
+    removed = []
+    for version in versions[keep:]:
+        if version != current:
+            shutil.rmtree(os.path.join(versions_root, version), ignore_errors=True)
+            removed.append(version)
+    return removed
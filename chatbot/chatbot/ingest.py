@@ -2,80 +2,317 @@
 
 import os
 import re
-from docx import Document
+import json
+import hashlib
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain.docstore.document import Document as LangchainDocument
-from config import EMBEDDING_MODEL_NAME, CHUNK_SIZE, CHUNK_OVERLAP, CLEANED_DIR, PDF_DIR, VECTORSTORE_DIR
+from config import (
+    EMBEDDING_MODEL_NAME, CHUNK_SIZE, CHUNK_OVERLAP, CLEANED_DIR, PDF_DIR, VECTORSTORE_DIR,
+    INGEST_WORKERS, EMBED_BATCH_SIZE, EMBED_NORMALIZE, EMBED_MULTI_PROCESS,
+    EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_DIR, FAISS_INDEX_TYPE, IVF_NLIST, IVF_NPROBE,
+    HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH, PQ_M, PQ_NBITS, INDEX_SNAPSHOTS_KEEP,
+    EMBEDDING_BACKEND, ONNX_MODEL_DIR, ONNX_QUANTIZED, ONNX_THREADS, ONNX_MAX_LENGTH,
+    INGEST_SOURCES, EXTRACTION_CACHE_DIR,
+)
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+from index_factory import build_index, set_search_params, supports_removal, describe
+from lazy_store import export_docstore
+from bm25 import BM25Index
+from index_snapshots import current_index_dir, new_version_dir, clone_version, publish, prune_versions
+from embedding_backend import load_embedding_model, backend_label, cache_model_id
+from source_registry import SourceRegistry, REGISTRY_FILE, normalize_name
+from extract import ExtractionCache, EXTRACTABLE
 
-# 🔍 Read DOCX files
-def read_docx(file_path):
-    doc = Document(file_path)
-    return "\n".join([para.text for para in doc.paragraphs])
+MANIFEST_FILE = "manifest.json"
+ORIGINAL_PREFIX = "original/"  # manifest key prefix of files parsed straight from PDF_DIR
+_splitter = None
+_extraction_cache = None
 
 # 🧹 Optional: additional cleaning
 def clean_text(text):
     text = re.sub(r"\*|\d+\.", "", text)
     return text.strip()
 
+# 🔑 Content hash used to detect changed files
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# 📒 Manifest: what is in the index, per source file (hash, mtime, size, chunk IDs)
+def load_manifest(directory):
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(files, directory):
+    manifest = {
+        "model": EMBEDDING_MODEL_NAME,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "normalize": EMBED_NORMALIZE,
+        "index_type": FAISS_INDEX_TYPE,
+        "embedding_backend": backend_label(EMBEDDING_BACKEND, ONNX_QUANTIZED),
+        "files": files,
+    }
+    tmp_path = os.path.join(directory, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+
+def list_source_files(sources):
+    """Manifest keys of the files to index, per INGEST_SOURCES. Originals are keyed ORIGINAL_PREFIX + name."""
+    cleaned = []
+    if INGEST_SOURCES in ("cleaned", "both"):
+        cleaned = sorted(f for f in os.listdir(CLEANED_DIR) if f.endswith((".txt", ".docx")))
+    originals = []
+    if INGEST_SOURCES in ("originals", "both"):
+        # A hand-cleaned copy wins over parsing its original
+        covered = {normalize_name(os.path.splitext(f)[0]) for f in cleaned}
+        originals = [
+            ORIGINAL_PREFIX + name for name in sorted(sources.by_name)
+            if name.lower().endswith(EXTRACTABLE) and normalize_name(os.path.splitext(name)[0]) not in covered
+        ]
+    return cleaned + originals
+
+def source_path(file):
+    if file.startswith(ORIGINAL_PREFIX):
+        return os.path.join(PDF_DIR, file[len(ORIGINAL_PREFIX):])
+    return os.path.join(CLEANED_DIR, file)
+
+# 🧠 Embedding model with batched (and optionally multi-process) encoding
+def make_embeddings(batch_size=EMBED_BATCH_SIZE, multi_process=EMBED_MULTI_PROCESS):
+    def load_model():
+        return load_embedding_model(
+            EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME, EMBED_NORMALIZE, batch_size, multi_process,
+            ONNX_MODEL_DIR, ONNX_QUANTIZED, ONNX_MAX_LENGTH, ONNX_THREADS,
+        )
+
+    if not EMBEDDING_CACHE_ENABLED:
+        return load_model()
+    # The model is only loaded if some chunk is missing from the cache
+    model_id = cache_model_id(EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, ONNX_QUANTIZED, EMBED_NORMALIZE)
+    cache = EmbeddingCache(EMBEDDING_CACHE_DIR, model_id)
+    return CachedEmbeddings(load_model, cache)
+
+def _get_splitter():
+    # One splitter per worker process
+    global _splitter
+    if _splitter is None:
+        _splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return _splitter
+
+def _get_extraction_cache():
+    global _extraction_cache
+    if _extraction_cache is None:
+        _extraction_cache = ExtractionCache(EXTRACTION_CACHE_DIR)
+    return _extraction_cache
+
+# 🧩 Load, clean, split and tag one cleaned file or original (runs inside the process pool)
+def build_chunks(file, file_hash, source_names):
+    splitter = _get_splitter()
+    path = source_path(file)
+    name = os.path.basename(path)
+    base_name = os.path.splitext(name)[0]
+
+    # 🔄 Load text content (DOCX/PDF are parsed once per content hash, then read from the cache)
+    if file.endswith(".txt") and not file.startswith(ORIGINAL_PREFIX):
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = _get_extraction_cache().extract(path, file_hash)
+    if not text.strip():
+        print(f"⚠️ No text found in {name} (scanned PDF?), nothing to index")
+
+    text = clean_text(text)
+    chunks = splitter.create_documents([text])
+
+    # 🔗 Match with original file (registry built once per run, see SourceRegistry)
+    if file.startswith(ORIGINAL_PREFIX):
+        matched_file = name
+    else:
+        matched_file = source_names.get(normalize_name(base_name))
+    source_file = matched_file if matched_file else f"{base_name}.docx"
+
+    # 🏷️ Metadata tagging
+    if "cover" in base_name.lower():
+        doc_type = "cover_page"
+    elif any(term in base_name.lower() for term in ["digital meeting", "online meeting", "virtual meeting"]):
+        doc_type = "digital"
+    elif "etiquette" in base_name.lower() or "physical" in base_name.lower():
+        doc_type = "physical"
+    else:
+        doc_type = "general"
+
+    # 📎 Attach metadata (and a stable ID) to each chunk
+    for i, chunk in enumerate(chunks):
+        chunk.id = f"{file}::{file_hash[:12]}::{i}"
+        chunk.metadata["source"] = source_file
+        chunk.metadata["title"] = base_name.replace("_", " ").lower().strip()
+        chunk.metadata["doc_type"] = doc_type
+        chunk.metadata["chunk_index"] = i
+    return chunks
+
+def _rate(count, seconds):
+    return f"{count / seconds:.1f}/s" if seconds > 0 else "n/a"
+
+# ✂️ Stage 1: parse + split in a process pool
+def split_files(files, workers, source_names):
+    hashes = [files[file]["sha256"] for file in files]
+    names = [source_names] * len(hashes)
+    if workers <= 1 or len(files) <= 1:
+        return list(map(build_chunks, files, hashes, names))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(build_chunks, files, hashes, names, chunksize=4))
+
 # 🚀 Main ingestion function
-def ingest_documents():
-    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
-    docs = []
+def ingest_documents(incremental=False, workers=INGEST_WORKERS, batch_size=EMBED_BATCH_SIZE, multi_process=EMBED_MULTI_PROCESS):
+    embeddings = make_embeddings(batch_size, multi_process)
+    # The published snapshot is only read; a new one is written next to it and then published
+    source_dir = current_index_dir(VECTORSTORE_DIR)
 
-    for file in os.listdir(CLEANED_DIR):
-        path = os.path.join(CLEANED_DIR, file)
-
-        # 🔄 Load text content
-        if file.endswith(".txt"):
-            with open(path, encoding="utf-8") as f:
-                text = f.read()
-            base_name = file.replace(".txt", "")
-        elif file.endswith(".docx"):
-            text = read_docx(path)
-            base_name = file.replace(".docx", "")
-        else:
+    manifest = load_manifest(source_dir) if incremental else None
+    if incremental and (
+        manifest is None
+        or not os.path.exists(os.path.join(source_dir, "index.faiss"))
+        or (manifest["model"], manifest["chunk_size"], manifest["chunk_overlap"], manifest.get("normalize"),
+            manifest.get("index_type"), manifest.get("embedding_backend", "torch"))
+        != (EMBEDDING_MODEL_NAME, CHUNK_SIZE, CHUNK_OVERLAP, EMBED_NORMALIZE, FAISS_INDEX_TYPE,
+            backend_label(EMBEDDING_BACKEND, ONNX_QUANTIZED))
+    ):
+        print("ℹ️ No compatible manifest/index found, doing a full rebuild.")
+        manifest = None
+    previous = manifest["files"] if manifest else {}
+
+    # 📎 Originals in PDF_DIR (name, size, hash), for source matching here and lookups in the server
+    previous_sources = SourceRegistry.load(source_dir) if SourceRegistry.exists(source_dir) else None
+    sources = SourceRegistry.scan(PDF_DIR, previous_sources)
+
+    # 🔎 Work out what changed since the last run (mtime+size first, hash only when those differ)
+    files = {}
+    changed = []
+    for file in list_source_files(sources):
+        stat = os.stat(source_path(file))
+        entry = previous.get(file)
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            files[file] = entry
+            continue
+        file_hash = file_sha256(source_path(file))
+        if entry and entry["sha256"] == file_hash:
+            files[file] = {**entry, "mtime": stat.st_mtime, "size": stat.st_size}
             continue
+        files[file] = {"sha256": file_hash, "mtime": stat.st_mtime, "size": stat.st_size, "chunk_ids": []}
+        changed.append(file)
 
-        text = clean_text(text)
-        chunks = splitter.create_documents([text])
-
-        # 🔗 Match with original file
-        matched_file = None
-        for f in os.listdir(PDF_DIR):
-            filename_wo_ext, _ = os.path.splitext(f)
-            if base_name.lower() == filename_wo_ext.lower():
-                matched_file = f
-                break
-
-        source_file = matched_file if matched_file else f"{base_name}.docx"
-
-        # 🏷️ Metadata tagging
-        if "cover" in base_name.lower():
-            doc_type = "cover_page"
-        elif any(term in base_name.lower() for term in ["digital meeting", "online meeting", "virtual meeting"]):
-            doc_type = "digital"
-        elif "etiquette" in base_name.lower() or "physical" in base_name.lower():
-            doc_type = "physical"
+    removed = [file for file in previous if file not in files]
+    stale_ids = [cid for file in changed + removed for cid in previous.get(file, {}).get("chunk_ids", [])]
+
+    if manifest is not None and not changed and not removed:
+        if files == previous and previous_sources is not None and sources.by_name == previous_sources.by_name:
+            print("✅ Index already up to date.")
+            return
+        # Same chunks, but mtimes or the originals moved: published snapshots are never rewritten,
+        # so the refreshed manifest and registry go into a new version next to links to the index files
+        target_dir = clone_version(VECTORSTORE_DIR, source_dir, skip=(MANIFEST_FILE, REGISTRY_FILE))
+        save_manifest(files, target_dir)
+        sources.save(target_dir)
+        publish(VECTORSTORE_DIR, target_dir)
+        prune_versions(VECTORSTORE_DIR, INDEX_SNAPSHOTS_KEEP)
+        print(f"✅ Index already up to date (manifest and source registry refreshed as version {os.path.basename(target_dir)}).")
+        return
+
+    # ✂️ Stage 1: parse + split
+    started = time.perf_counter()
+    docs = []
+    for file, chunks in zip(changed, split_files({file: files[file] for file in changed}, workers, sources.names_by_key())):
+        files[file]["chunk_ids"] = [chunk.id for chunk in chunks]
+        docs.extend(chunks)
+    split_seconds = time.perf_counter() - started
+    print(f"✂️ Split {len(changed)} file(s) into {len(docs)} chunk(s) in {split_seconds:.1f}s ({_rate(len(docs), split_seconds)} chunks, {workers} worker(s))")
+
+    # 🧠 Stage 2: embed in large batches
+    started = time.perf_counter()
+    texts = [doc.page_content for doc in docs]
+    vectors = embeddings.embed_documents(texts) if texts else []
+    embed_seconds = time.perf_counter() - started
+    print(f"🧠 Embedded {len(texts)} chunk(s) in {embed_seconds:.1f}s ({_rate(len(texts), embed_seconds)} chunks, batch size {batch_size})")
+    if isinstance(embeddings, CachedEmbeddings):
+        print(f"   ↳ embedding cache: {embeddings.cache.hits} hit(s), {embeddings.cache.misses} miss(es)")
+
+    # 💾 Stage 3: single writer builds/updates the FAISS index
+    started = time.perf_counter()
+    text_embeddings = list(zip(texts, vectors))
+    metadatas = [doc.metadata for doc in docs]
+    ids = [doc.id for doc in docs]
+    if manifest is None:
+        if not text_embeddings:
+            print("⚠️ No documents found, index not written.")
+            return
+        index = build_index(
+            vectors, FAISS_INDEX_TYPE, nlist=IVF_NLIST, hnsw_m=HNSW_M,
+            ef_construction=HNSW_EF_CONSTRUCTION, pq_m=PQ_M, pq_nbits=PQ_NBITS,
+        )
+        set_search_params(index, IVF_NPROBE, HNSW_EF_SEARCH)
+        vectorstore = FAISS(embeddings, index, InMemoryDocstore(), {})
+        vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        bm25 = BM25Index()
+        bm25.add(ids, texts)
+    else:
+        vectorstore = FAISS.load_local(source_dir, embeddings, allow_dangerous_deserialization=True)
+        if stale_ids and not supports_removal(vectorstore.index):
+            print("ℹ️ Only flat indexes can drop vectors safely, doing a full rebuild instead.")
+            return ingest_documents(incremental=False, workers=workers, batch_size=batch_size, multi_process=multi_process)
+        if BM25Index.exists(source_dir):
+            bm25 = BM25Index.load(source_dir)
         else:
-            doc_type = "general"
-
-        # 📎 Attach metadata to each chunk
-        for chunk in chunks:
-            chunk.metadata["source"] = source_file
-            chunk.metadata["title"] = base_name.replace("_", " ").lower().strip()
-            chunk.metadata["doc_type"] = doc_type
-            docs.append(chunk)
-
-    # 💾 Save to FAISS
-    vectorstore = FAISS.from_documents(docs, embeddings)
-    vectorstore.save_local(VECTORSTORE_DIR)
+            # Older index without a lexical side: index everything that stays
+            kept_ids = list(vectorstore.index_to_docstore_id.values())
+            bm25 = BM25Index()
+            bm25.add(kept_ids, [vectorstore.docstore.search(doc_id).page_content for doc_id in kept_ids])
+        if stale_ids:
+            vectorstore.delete(stale_ids)
+            bm25.delete(stale_ids)
+        if text_embeddings:
+            vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+            bm25.add(ids, texts)
+        print(f"🔁 {len(changed)} new/changed and {len(removed)} removed file(s).")
+
+    target_dir = new_version_dir(VECTORSTORE_DIR)
+    vectorstore.save_local(target_dir)
+    # Same chunks in a compact, lazily-readable form for VECTORSTORE_LOAD_MODE = "mmap"
+    export_docstore(vectorstore, target_dir)
+    bm25.save(target_dir)
+    save_manifest(files, target_dir)
+    sources.save(target_dir)
+    write_seconds = time.perf_counter() - started
+    print(f"💾 Wrote {len(ids)} chunk(s) in {write_seconds:.1f}s ({_rate(len(ids), write_seconds)} chunks) → {describe(vectorstore.index)}")
+
+    # 📌 Flip CURRENT to the new snapshot; running servers pick it up without a restart
+    publish(VECTORSTORE_DIR, target_dir)
+    pruned = prune_versions(VECTORSTORE_DIR, INDEX_SNAPSHOTS_KEEP)
+    print(f"📌 Published index version {os.path.basename(target_dir)}" + (f" (removed {len(pruned)} old version(s))" if pruned else ""))
     print("✅ Ingestion complete.")
 
 if __name__ == "__main__":
-    ingest_documents()
+    parser = argparse.ArgumentParser(description="Build the FAISS index from the cleaned documents.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only embed new/changed files and drop chunks of deleted ones (falls back to a full rebuild)")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="processes used to parse and split files")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="chunks per embedding forward pass")
+    parser.add_argument("--multi-process", action="store_true", default=EMBED_MULTI_PROCESS,
+                        help="encode with a sentence-transformers process pool across CPU cores (torch backend only)")
+    args = parser.parse_args()
+    ingest_documents(incremental=args.incremental, workers=args.workers,
+                     batch_size=args.batch_size, multi_process=args.multi_process)
 
 
 # import os
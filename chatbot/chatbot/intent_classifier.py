@@ -0,0 +1,186 @@
+# intent_classifier.py
+
+import math
+from functools import lru_cache
+import numpy as np
+
+# 🏷️ Labelled examples the centroids are built from (extend these rather than adding keywords)
+HR_EXAMPLES = [
+    "how do i apply for leave?",
+    "what is the annual leave entitlement?",
+    "how many days of medical leave do we get?",
+    "what is the company policy on overtime?",
+    "who do i contact about my payroll?",
+    "when is salary credited each month?",
+    "what is the resignation notice period?",
+    "how does the promotion review work?",
+    "what are the pantry rules?",
+    "what is the meeting etiquette for clients?",
+    "how should i behave in an online meeting?",
+    "what is the clean desk policy when offboarding?",
+    "what is the onboarding procedure for new employees?",
+    "how do i set up my webmail autoresponder?",
+    "what is the policy on office laptops?",
+    "who owns the work i create at verztec?",
+    "how do i submit a complaint to hr?",
+    "what is the procedure for the quality audit?",
+    "where can i find the quality manual?",
+    "what does the controlled copy number mean?",
+    "how do i import a supplier e-invoice into abss?",
+    "what are the basic telephone skills expected of staff?",
+    "how should i write a business email?",
+    "what forms do i need for a project sign off?",
+    "what is the sop checklist for transcription projects?",
+    "what are my roles and responsibilities?",
+    "how is attendance recorded?",
+    "what benefits do employees get?",
+    "what is the process for customer feedback?",
+    "can i claim transport expenses?",
+]
+
+NON_HR_EXAMPLES = [
+    "what is 1+1?",
+    "what should i eat for lunch?",
+    "tell me a joke",
+    "what is the weather today?",
+    "who won the football match yesterday?",
+    "write me a poem about the sea",
+    "what is the capital of france?",
+    "how do i bake a chocolate cake?",
+    "recommend a good movie",
+    "what is the meaning of life?",
+    "how far is the moon?",
+    "translate hello into spanish",
+    "what time is it in tokyo?",
+    "who is the president of the united states?",
+    "how do i fix a flat bicycle tyre?",
+    "what is a good name for a cat?",
+    "explain quantum physics simply",
+    "what's the best phone to buy?",
+    "play some music",
+    "how tall is mount everest?",
+    "what is your favourite colour?",
+    "can you help me with my maths homework?",
+    "how do i learn to play guitar?",
+    "what are some good holiday destinations?",
+    "how many calories are in an apple?",
+]
+
+PERSONAL_EXAMPLES = [
+    "my father is angry with me, what should i do?",
+    "i had a fight with my girlfriend",
+    "why is my mother always upset?",
+    "i feel sad and lonely",
+    "how do i deal with my depression?",
+    "my brother hates me",
+    "i am going through a breakup",
+    "how do i tell someone i love them?",
+    "my family doesn't understand me",
+    "i feel anxious all the time",
+    "how can i improve my mental health?",
+    "my boyfriend is ignoring me",
+    "i'm feeling really emotional today",
+    "should i forgive my sister?",
+    "why do i feel so tired of everything?",
+    "how do i cope with the death of a relative?",
+    "my relationship is falling apart",
+    "i can't stop crying",
+]
+
+NON_PERSONAL_EXAMPLES = HR_EXAMPLES + [
+    "what is 1+1?",
+    "what is the capital of france?",
+    "how do i bake a chocolate cake?",
+    "what time is it in tokyo?",
+    "i feel the leave form is confusing, how do i fill it in?",
+    "can family members visit the office?",
+    "is there compassionate leave for a death in the family?",
+    "how do i give feedback to my manager?",
+]
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _fit_platt(margins, labels, iterations=50):
+    """Platt scaling: fit p = sigmoid(a * margin + b) with Newton steps and Platt's smoothed targets."""
+    margins = np.asarray(margins, dtype=np.float64)
+    labels = np.asarray(labels, dtype=np.float64)
+    n_pos, n_neg = labels.sum(), len(labels) - labels.sum()
+    targets = np.where(labels == 1, (n_pos + 1) / (n_pos + 2), 1 / (n_neg + 2))
+
+    a, b = 1.0, 0.0
+    for _ in range(iterations):
+        p = _sigmoid(a * margins + b)
+        w = p * (1 - p) + 1e-9
+        grad = np.array([np.sum((p - targets) * margins), np.sum(p - targets)])
+        hess = np.array([
+            [np.sum(w * margins * margins) + 1e-6, np.sum(w * margins)],
+            [np.sum(w * margins), np.sum(w) + 1e-6],
+        ])
+        step = np.linalg.solve(hess, grad)
+        a, b = a - step[0], b - step[1]
+        if np.abs(step).max() < 1e-8:
+            break
+    return float(a), float(b)
+
+
+class CentroidIntent:
+    """Binary intent score from the cosine margin between a positive and a negative class centroid.
+
+    The margin is mapped to a probability with Platt scaling, fitted on leave-one-out margins
+    so the training examples don't make the scores look more confident than they are.
+    """
+
+    def __init__(self, positive_vectors, negative_vectors):
+        pos = _normalize(positive_vectors)
+        neg = _normalize(negative_vectors)
+        pos_sum, neg_sum = pos.sum(axis=0), neg.sum(axis=0)
+        self.pos_centroid = _normalize(pos_sum)
+        self.neg_centroid = _normalize(neg_sum)
+
+        # Leave-one-out: each example is scored against centroids that exclude itself
+        pos_margins = np.sum(pos * _normalize(pos_sum - pos), axis=1) - pos @ self.neg_centroid
+        neg_margins = neg @ self.pos_centroid - np.sum(neg * _normalize(neg_sum - neg), axis=1)
+        margins = np.concatenate([pos_margins, neg_margins])
+        labels = np.concatenate([np.ones(len(pos)), np.zeros(len(neg))])
+        self.a, self.b = _fit_platt(margins, labels)
+
+    def score(self, vector) -> float:
+        v = _normalize(vector)
+        margin = float(v @ self.pos_centroid - v @ self.neg_centroid)
+        return 1.0 / (1.0 + math.exp(-(self.a * margin + self.b)))
+
+
+class IntentClassifier:
+    """HR / personal intent scores from the already-loaded sentence embedding model."""
+
+    def __init__(self, embeddings, cache_size=1024):
+        self.embeddings = embeddings
+        hr = embeddings.embed_documents(HR_EXAMPLES)
+        non_hr = embeddings.embed_documents(NON_HR_EXAMPLES)
+        personal = embeddings.embed_documents(PERSONAL_EXAMPLES)
+        non_personal = embeddings.embed_documents(NON_PERSONAL_EXAMPLES)
+        self.hr = CentroidIntent(hr, non_hr)
+        self.personal = CentroidIntent(personal, non_personal)
+        self._embed = lru_cache(maxsize=cache_size)(self._embed_uncached)
+
+    def _embed_uncached(self, question: str):
+        return np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+
+    def embed(self, question: str):
+        """Cached question embedding, shared with other per-question lookups (e.g. the answer cache)."""
+        return self._embed(question.strip().lower())
+
+    def hr_score(self, question: str) -> float:
+        return self.hr.score(self.embed(question))
+
+    def personal_score(self, question: str) -> float:
+        return self.personal.score(self.embed(question))
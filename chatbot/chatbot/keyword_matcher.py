@@ -0,0 +1,66 @@
+# keyword_matcher.py
+
+import re
+import json
+from rapidfuzz import fuzz, process
+
+
+def load_keyword_sets(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class KeywordMatcher:
+    """Substring keyword test compiled once: one alternation regex for exact hits, and one
+    rapidfuzz call across all keywords for the fuzzy fallback (partial_ratio >= `fuzzy_threshold`)."""
+
+    def __init__(self, keywords, fuzzy_threshold=80):
+        self.keywords = [kw.lower() for kw in keywords]
+        self.fuzzy_threshold = fuzzy_threshold
+        # Longest first, so the reported hit is the most specific keyword
+        alternation = "|".join(re.escape(kw) for kw in sorted(set(self.keywords), key=len, reverse=True))
+        self._exact = re.compile(alternation) if alternation else None
+
+    def exact(self, text: str):
+        """The first keyword contained in `text`, or None."""
+        if self._exact is None:
+            return None
+        match = self._exact.search(text.lower())
+        return match.group(0) if match else None
+
+    def fuzzy(self, text: str):
+        """(keyword, score) of the best fuzzy match at or above the threshold, or None."""
+        if not self.keywords:
+            return None
+        best = process.extractOne(
+            text.lower(), self.keywords, scorer=fuzz.partial_ratio, processor=None, score_cutoff=self.fuzzy_threshold
+        )
+        return (best[0], best[1]) if best else None
+
+    def matches(self, text: str, use_fuzzy=True) -> bool:
+        return self.exact(text) is not None or (use_fuzzy and self.fuzzy(text) is not None)
+
+    def matches_many(self, texts, use_fuzzy=True, workers=-1):
+        """Bulk version of matches() for offline screening: exact hits by regex, the rest scored
+        against every keyword in a single cdist call (spread over `workers` threads)."""
+        texts = [text.lower() for text in texts]
+        hits = [self._exact is not None and self._exact.search(text) is not None for text in texts]
+        pending = [i for i, hit in enumerate(hits) if not hit]
+        if use_fuzzy and pending and self.keywords:
+            scores = process.cdist(
+                [texts[i] for i in pending], self.keywords, scorer=fuzz.partial_ratio,
+                processor=None, score_cutoff=self.fuzzy_threshold, workers=workers,
+            )
+            for i, row in zip(pending, scores):
+                hits[i] = bool(row.max() >= self.fuzzy_threshold)
+        return hits
+
+
+class PatternMatcher:
+    """Several regexes compiled into one alternation."""
+
+    def __init__(self, patterns):
+        self._regex = re.compile("|".join(f"(?:{p})" for p in patterns)) if patterns else None
+
+    def search(self, text: str) -> bool:
+        return self._regex is not None and self._regex.search(text.lower()) is not None
@@ -0,0 +1,129 @@
+# lazy_store.py
+
+import os
+import re
+import json
+import sqlite3
+import threading
+from collections.abc import Mapping
+import faiss
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+
+DOCSTORE_FILE = "docstore.sqlite"
+
+# Metadata promoted to their own indexed columns (everything else stays in the JSON blob)
+INDEXED_FIELDS = ("doc_type", "title", "source")
+
+
+def export_docstore(vectorstore, directory):
+    """Write the chunks of a FAISS vector store to `directory`/docstore.sqlite, one row per index position."""
+    path = os.path.join(directory, DOCSTORE_FILE)
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        columns = ", ".join(f"{field} TEXT" for field in INDEXED_FIELDS)
+        conn.execute(f"CREATE TABLE chunks (pos INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, {columns}, page_content TEXT NOT NULL, metadata TEXT NOT NULL)")
+        rows = []
+        for pos, doc_id in sorted(vectorstore.index_to_docstore_id.items()):
+            doc = vectorstore.docstore.search(doc_id)
+            fields = [doc.metadata.get(field) for field in INDEXED_FIELDS]
+            rows.append((pos, doc_id, *fields, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False)))
+        placeholders = ", ".join("?" * (len(INDEXED_FIELDS) + 4))
+        conn.executemany(f"INSERT INTO chunks VALUES ({placeholders})", rows)
+        for field in INDEXED_FIELDS:
+            conn.execute(f"CREATE INDEX idx_chunks_{field} ON chunks({field})")
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+
+class SQLiteDocstore(Docstore):
+    """Read-only docstore that fetches chunk text and metadata from SQLite by ID on demand."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def conn(self):
+        # SQLite connections are per thread; reads go through the OS page cache shared by all workers
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def search(self, search: str):
+        row = self.conn.execute("SELECT page_content, metadata FROM chunks WHERE id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def metadata_rows(self, fields):
+        """(pos, id, {field: value}) for every chunk; indexed fields come straight from their columns."""
+        selects = []
+        for field in fields:
+            if not re.fullmatch(r"\w+", field):
+                raise ValueError(f"Invalid metadata field name {field!r}")
+            selects.append(field if field in INDEXED_FIELDS else f"json_extract(metadata, '$.{field}')")
+        for row in self.conn.execute(f"SELECT pos, id, {', '.join(selects)} FROM chunks"):
+            yield row[0], row[1], dict(zip(fields, row[2:]))
+
+    def add(self, texts):
+        raise NotImplementedError("SQLiteDocstore is read-only; re-run ingest.py to change it.")
+
+    def delete(self, ids):
+        raise NotImplementedError("SQLiteDocstore is read-only; re-run ingest.py to change it.")
+
+
+class PositionMap(Mapping):
+    """index position -> docstore ID, looked up in SQLite instead of held in a dict."""
+
+    def __init__(self, docstore: SQLiteDocstore):
+        self.docstore = docstore
+
+    def __getitem__(self, pos):
+        row = self.docstore.conn.execute("SELECT id FROM chunks WHERE pos = ?", (int(pos),)).fetchone()
+        if row is None:
+            raise KeyError(pos)
+        return row[0]
+
+    def __len__(self):
+        return self.docstore.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def __iter__(self):
+        for (pos,) in self.docstore.conn.execute("SELECT pos FROM chunks ORDER BY pos"):
+            yield pos
+
+
+def read_index_mmap(path):
+    """Memory-map a FAISS index read-only, falling back to a normal read for index types that can't be mapped.
+
+    IO_FLAG_MMAP_IFC maps the vectors of flat and HNSW indexes, but IVF indexes reject it. Those are
+    read with IO_FLAG_MMAP alone, which keeps their inverted lists (nearly all of the file) on disk
+    and maps them instead.
+    """
+    attempts = [faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY]
+    if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        attempts.insert(0, attempts[0] | faiss.IO_FLAG_MMAP_IFC)
+    for flags in attempts:
+        try:
+            return faiss.read_index(path, flags)
+        except RuntimeError as e:
+            error = e
+    print(f"⚠️ Could not mmap {path} ({error}); reading it into memory instead.")
+    return faiss.read_index(path)
+
+
+def load_mmap_vectorstore(directory, embeddings):
+    docstore_path = os.path.join(directory, DOCSTORE_FILE)
+    if not os.path.exists(docstore_path):
+        raise FileNotFoundError(f"{docstore_path} is missing; re-run ingest.py to create it.")
+    index = read_index_mmap(os.path.join(directory, "index.faiss"))
+    docstore = SQLiteDocstore(docstore_path)
+    return FAISS(embeddings, index, docstore, PositionMap(docstore))
@@ -0,0 +1,51 @@
+# llm_gate.py
+
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class LLMQueueFull(Exception):
+    """Raised when the Ollama backend already has too many requests running or waiting."""
+
+
+class LLMGate:
+    """Bounded admission in front of the LLM backend.
+
+    At most `max_concurrency` calls run at once; up to `max_waiting` more may queue for a slot.
+    Anything beyond that (or waiting longer than `wait_timeout` seconds) is refused with LLMQueueFull
+    so the endpoint can answer 503 instead of piling up work.
+    """
+
+    def __init__(self, max_concurrency: int, max_waiting: int, wait_timeout: float = None):
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def is_full(self) -> bool:
+        return self.active >= self.max_concurrency and self.waiting >= self.max_waiting
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.is_full():
+            raise LLMQueueFull(f"{self.active} LLM calls running and {self.waiting} waiting")
+
+        self.waiting += 1
+        try:
+            if self.wait_timeout:
+                await asyncio.wait_for(self._semaphore.acquire(), self.wait_timeout)
+            else:
+                await self._semaphore.acquire()
+        except asyncio.TimeoutError:
+            raise LLMQueueFull(f"No LLM slot became free within {self.wait_timeout}s")
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
@@ -0,0 +1,101 @@
+# metadata_index.py
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+
+def _search_params(index, selector):
+    # Keep the index's own nprobe / efSearch when adding the ID selector
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+class MetadataIndex:
+    """Index position sets per metadata value (doc_type, source, ...), used to restrict the FAISS
+    search itself with an IDSelector instead of filtering the top-k afterwards."""
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.positions = {field: {} for field in self.fields}
+        self.ids = {field: {} for field in self.fields}
+        self._selectors = {}
+        self._bm25_masks = {}
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, fields):
+        index = cls(fields)
+        docstore = vectorstore.docstore
+        if hasattr(docstore, "metadata_rows"):
+            rows = docstore.metadata_rows(index.fields)
+        else:
+            rows = (
+                (pos, doc_id, docstore.search(doc_id).metadata)
+                for pos, doc_id in vectorstore.index_to_docstore_id.items()
+            )
+
+        positions = {field: {} for field in index.fields}
+        for pos, doc_id, metadata in rows:
+            for field in index.fields:
+                value = metadata.get(field)
+                if value is not None:
+                    positions[field].setdefault(value, []).append((pos, doc_id))
+        for field, values in positions.items():
+            for value, entries in values.items():
+                index.positions[field][value] = np.asarray(sorted(pos for pos, _ in entries), dtype=np.int64)
+                index.ids[field][value] = {doc_id for _, doc_id in entries}
+        return index
+
+    def _key(self, where):
+        return tuple(sorted((field, tuple(sorted(v if isinstance(v, (list, tuple, set)) else [v]))) for field, v in where.items()))
+
+    def match(self, where):
+        """(positions, chunk IDs) matching every field in `where`; a field may list several accepted values."""
+        positions, ids = None, None
+        for field, values in where.items():
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            field_positions = [self.positions.get(field, {}).get(v) for v in values]
+            field_positions = np.unique(np.concatenate([p for p in field_positions if p is not None] or [np.zeros(0, dtype=np.int64)]))
+            field_ids = set().union(*(self.ids.get(field, {}).get(v, set()) for v in values))
+            positions = field_positions if positions is None else np.intersect1d(positions, field_positions)
+            ids = field_ids if ids is None else ids & field_ids
+        return positions, ids
+
+    def _selector(self, where):
+        key = self._key(where)
+        if key not in self._selectors:
+            positions, _ = self.match(where)
+            # The selector keeps a pointer into `positions`, so hold on to both
+            self._selectors[key] = (faiss.IDSelectorBatch(positions), positions)
+        return self._selectors[key]
+
+    def search(self, vectorstore, query_vector, k, where):
+        """similarity_search_with_score_by_vector, but only over chunks matching `where`."""
+        selector, positions = self._selector(where)
+        if not len(positions):
+            return []
+        query = np.asarray([query_vector], dtype=np.float32)
+        distances, indices = vectorstore.index.search(query, min(k, len(positions)), params=_search_params(vectorstore.index, selector))
+        docs_and_scores = []
+        for pos, score in zip(indices[0], distances[0]):
+            if pos == -1:
+                continue
+            doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(pos)])
+            if isinstance(doc, Document):
+                docs_and_scores.append((doc, float(score)))
+        return docs_and_scores
+
+    def bm25_mask(self, bm25, where):
+        """Boolean mask over BM25 rows for the same filter."""
+        key = (self._key(where), len(bm25.doc_ids))
+        if key not in self._bm25_masks:
+            _, ids = self.match(where)
+            mask = np.zeros(len(bm25.doc_ids), dtype=bool)
+            rows = [bm25.row_of[doc_id] for doc_id in ids if doc_id in bm25.row_of]
+            mask[rows] = True
+            self._bm25_masks[key] = mask
+        return self._bm25_masks[key]
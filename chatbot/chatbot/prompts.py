@@ -0,0 +1,49 @@
+# prompts.py
+
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+
+SYSTEM_PREFIX = (
+    "You are a professional HR assistant at Verztec.\n"
+    "Answer only using the content provided in the document — do not add anything outside of it.\n"
+    "Summarize all key points mentioned in the document, not just one. Keep the tone clear and professional, and do not skip relevant sections.\n"
+    "Avoid overly casual language like 'just a heads up', 'don’t worry', or 'let them know what’s going on'.\n"
+    "Speak as if you're helping a colleague or employee in a business setting.\n"
+    "Avoid numbered or overly formatted lists unless they already exist in the document.\n"
+    "Be clear, concise, and human — not robotic or overly formal."
+)
+
+# Identical on every grounded request, so the backend can keep its prefill cached
+SYSTEM_MESSAGE = SystemMessage(content=SYSTEM_PREFIX)
+
+
+def format_context(content: str) -> str:
+    return f"---\n{content}\n---\n"
+
+
+def grounded_messages(context_block: str, question: str, history=()):
+    """[system, (earlier turns), user] chat messages for a question answered from `context_block`.
+
+    `history` holds (question, answer) pairs of the session's previous turns, for follow-up questions.
+    """
+    earlier = []
+    for previous_question, previous_answer in history:
+        earlier += [HumanMessage(content=previous_question), AIMessage(content=previous_answer)]
+    return [
+        SYSTEM_MESSAGE,
+        *earlier,
+        HumanMessage(content=(
+            f"{context_block}"
+            f"Based only on the content above, how would you answer this question?\n"
+            f"{question}"
+        )),
+    ]
+
+
+def legacy_prompt(context_block: str, question: str) -> str:
+    """The single-string prompt used before the system message was split out (kept for benchmarks)."""
+    return (
+        f"{SYSTEM_PREFIX}\n"
+        f"{context_block}"
+        f"Based only on the content above, how would you answer this question?\n"
+        f"{question}"
+    )
@@ -0,0 +1,130 @@
+# query_batcher.py
+
+import time
+import asyncio
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from chatbot.embedding_cache import encode_queries
+from chatbot.telemetry import observe_stage
+
+
+class QueryBatcher:
+    """Micro-batches question encoding and FAISS search across concurrent requests.
+
+    The first waiting request opens a batch; it is run once `max_batch` requests are queued or
+    `max_wait_ms` has passed, as one embedding forward pass and one `index.search` over the stacked
+    query matrix. While a batch runs, new requests queue up and form the next one.
+
+    Each request names the vector store it searches, so requests pinned to different index
+    versions around a reload can share the queue; a batch is split per store before it runs.
+    """
+
+    def __init__(self, max_batch: int, max_wait_ms: float):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.queries = 0
+        self._queue = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        # Created on first use so the queue and task belong to the server's running loop
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def embed(self, store, text: str):
+        """Query vector for `text`, encoded together with whatever else is waiting."""
+        vector, _ = await self._submit(store, text, 0)
+        return vector
+
+    async def search(self, store, text: str, k: int):
+        """(query vector, [(Document, score)]) like similarity_search_with_score, batched."""
+        return await self._submit(store, text, k)
+
+    async def _submit(self, store, text, k):
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        submitted = time.perf_counter()
+        await self._queue.put((store, text, k, future))
+        result, embed_seconds, search_seconds = await future
+        # Each request is charged its whole batch's embed/search time, plus the time it waited for the batch
+        observe_stage("embed", embed_seconds)
+        if k:
+            observe_stage("search", search_seconds)
+        observe_stage("batch_wait", max(0.0, time.perf_counter() - submitted - embed_seconds - search_seconds))
+        return result
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item[0]), []).append(item)
+            for group in groups.values():
+                await self._run_group(group[0][0], group)
+
+    async def _run_group(self, store, batch):
+        try:
+            results, embed_seconds, search_seconds = await asyncio.to_thread(
+                self._process, store, [text for _, text, _, _ in batch], [k for _, _, k, _ in batch]
+            )
+        except Exception as e:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.queries += len(batch)
+        for (*_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result((result, embed_seconds, search_seconds))
+
+    def _process(self, store, texts, ks):
+        started = time.perf_counter()
+        # Duplicate questions in one batch are encoded once
+        unique = list(dict.fromkeys(texts))
+        vectors = np.asarray(encode_queries(store.embedding_function, unique), dtype=np.float32)
+        row_of = {text: row for row, text in enumerate(unique)}
+        embedded = time.perf_counter()
+
+        k_max = min(max(ks), store.index.ntotal)
+        hits = None
+        if k_max:
+            query = vectors.copy()
+            if store._normalize_L2:
+                faiss.normalize_L2(query)
+            hits = store.index.search(query, k_max)
+
+        results = []
+        for text, k in zip(texts, ks):
+            row = row_of[text]
+            docs_and_scores = []
+            if k and hits is not None:
+                for pos, score in zip(hits[1][row][:k], hits[0][row][:k]):
+                    if pos == -1:
+                        continue
+                    doc = store.docstore.search(store.index_to_docstore_id[int(pos)])
+                    if isinstance(doc, Document):
+                        docs_and_scores.append((doc, float(score)))
+            results.append((vectors[row].tolist(), docs_and_scores))
+        return results, embedded - started, time.perf_counter() - embedded
+
+    def snapshot(self):
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0,
+            "waiting": self._queue.qsize() if self._queue is not None else 0,
+        }
@@ -0,0 +1,114 @@
+# request_log.py
+
+import os
+import json
+import queue
+import atexit
+import threading
+from datetime import datetime
+
+
+class RequestLogger:
+    """JSON-lines request log written by a background thread.
+
+    `log()` only puts the record on a queue, so request handlers never touch the file. The writer
+    thread drains up to `batch_size` records at a time, writes them with one call and rotates the
+    file to `path`.1 .. `path`.`backups` once it passes `max_bytes`.
+
+    The thread is started on the first `log()` of each process, so a logger created before
+    serve.py forks its workers gets one writer per worker.
+    """
+
+    def __init__(self, path: str, max_bytes: int, backups: int, flush_interval: float = 1.0, batch_size: int = 256):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue = queue.SimpleQueue()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        atexit.register(self.close)
+
+    def _ensure_writer(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._queue = queue.SimpleQueue()
+            self._stopped = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="request-log", daemon=True)
+            self._thread.start()
+
+    def log(self, record: dict):
+        record.setdefault("ts", datetime.now().isoformat())
+        self._ensure_writer()
+        self._queue.put(record)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _write(self, records):
+        lines = []
+        for record in records:
+            try:
+                lines.append(json.dumps(record, ensure_ascii=False, default=str))
+            except (TypeError, ValueError):
+                self.dropped += 1
+        if not lines:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            written = os.fstat(f.fileno())
+        # Several workers append to the same file; only rotate it if nobody else already has
+        if written.st_size >= self.max_bytes and os.path.exists(self.path) and os.stat(self.path).st_ino == written.st_ino:
+            self._rotate()
+
+    def _drain(self):
+        records = []
+        while len(records) < self.batch_size:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return records
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            # Give a burst a moment to accumulate so it goes out as one write
+            self._stopped.wait(min(self.flush_interval, 0.05))
+            records = [first] + self._drain()
+            try:
+                self._write(records)
+            except OSError as e:
+                self.dropped += len(records)
+                print(f"⚠️ Could not write {self.path}: {e}")
+        self.flush()
+
+    def flush(self):
+        records = self._drain()
+        while records:
+            self._write(records)
+            records = self._drain()
+
+    def close(self):
+        if self._thread is not None and self._pid == os.getpid() and not self._stopped.is_set():
+            self._stopped.set()
+            self._thread.join(timeout=5)
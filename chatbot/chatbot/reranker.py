@@ -0,0 +1,35 @@
+# reranker.py
+
+import time
+
+
+class CrossEncoderReranker:
+    """Re-scores retrieved chunks with a small cross-encoder on CPU, within a time budget.
+
+    Candidates are scored in batches; if the budget runs out with batches still unscored, the
+    original (FAISS/fusion) order is kept so a slow request never waits on the reranker.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 16, max_length: int = 512):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        self.batch_size = batch_size
+
+    def rerank(self, query: str, docs_and_scores, top_n: int, budget_ms: float):
+        """Returns (docs_and_scores, reranked) where `reranked` is False when the budget forced a fallback."""
+        if len(docs_and_scores) <= 1:
+            return docs_and_scores[:top_n], False
+
+        deadline = time.perf_counter() + budget_ms / 1000
+        scores = []
+        for start in range(0, len(docs_and_scores), self.batch_size):
+            if time.perf_counter() > deadline:
+                return docs_and_scores[:top_n], False
+            batch = docs_and_scores[start:start + self.batch_size]
+            pairs = [(query, doc.page_content) for doc, _ in batch]
+            scores.extend(float(s) for s in self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False))
+        # Every batch got scored: use them even if the last one ran past the deadline
+
+        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [docs_and_scores[i] for i in order[:top_n]], True
@@ -0,0 +1,176 @@
+# session_store.py
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Turn:
+    question: str
+    answer: str
+    source_file: str
+    chunk_ids: tuple  # retrieval context the answer was grounded in, reusable by a follow-up
+    scores: tuple
+    created_at: float
+
+    def size(self) -> int:
+        # Rough byte count for the global memory cap (text dominates; the rest is small and fixed)
+        return len(self.question) + len(self.answer) + len(self.source_file or "") + sum(len(i) + 8 for i in self.chunk_ids) + 64
+
+
+class _Session:
+    __slots__ = ("turns", "bytes", "last_seen")
+
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)
+        self.bytes = 0
+        self.last_seen = time.time()
+
+
+class SessionStore:
+    """Per-session conversation history.
+
+    Each session keeps only its last `max_turns` turns (a ring buffer). Sessions idle for longer than
+    `idle_seconds` are dropped, and the least recently used ones are evicted whenever there are more
+    than `max_sessions` or the turns held add up to more than `max_bytes`. With `db_path` set, turns are
+    also written to SQLite and every read goes back to it, so a session follows its user across workers
+    and restarts.
+    """
+
+    def __init__(self, max_turns: int, idle_seconds: float, max_sessions: int, max_bytes: int, db_path: str = None):
+        self.max_turns = max_turns
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self.total_bytes = 0
+        self.evictions = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = os.getpid()
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS turns (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+                "created_at REAL NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL, source_file TEXT, "
+                "chunk_ids TEXT NOT NULL, scores TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_turns_session ON turns(session_id, id)")
+            self._conn.commit()
+
+    def _db(self):
+        # A SQLite connection must not cross a fork: each serve.py worker opens its own
+        if self._conn_pid != os.getpid():
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _drop(self, session_id):
+        session = self._sessions.pop(session_id)
+        self.total_bytes -= session.bytes
+        self.evictions += 1
+
+    def _evict(self, now):
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            idle = now - oldest.last_seen > self.idle_seconds
+            if not (idle or len(self._sessions) > self.max_sessions or self.total_bytes > self.max_bytes):
+                break
+            self._drop(oldest_id)
+
+    def _load(self, session_id):
+        session = _Session(self.max_turns)
+        if self._conn is not None:
+            rows = self._db().execute(
+                "SELECT question, answer, source_file, chunk_ids, scores, created_at FROM turns "
+                "WHERE session_id = ? AND created_at >= ? ORDER BY id DESC LIMIT ?",
+                (session_id, time.time() - self.idle_seconds, self.max_turns),
+            ).fetchall()
+            for question, answer, source_file, chunk_ids, scores, created_at in reversed(rows):
+                turn = Turn(question, answer, source_file, tuple(json.loads(chunk_ids)), tuple(json.loads(scores)), created_at)
+                session.turns.append(turn)
+                session.bytes += turn.size()
+        return session
+
+    def _session(self, session_id, create):
+        session = self._sessions.get(session_id)
+        # With SQLite the table is the source of truth: another worker may have added turns since
+        if session is None or self._conn is not None:
+            if session is not None:
+                self.total_bytes -= session.bytes
+            session = self._load(session_id)
+            if not session.turns and not create:
+                self._sessions.pop(session_id, None)
+                return None
+            self._sessions[session_id] = session
+            self.total_bytes += session.bytes
+        self._sessions.move_to_end(session_id)
+        session.last_seen = time.time()
+        return session
+
+    def recent(self, session_id: str, n: int = None):
+        """The session's last `n` turns (all kept turns by default), oldest first."""
+        with self._lock:
+            self._evict(time.time())
+            session = self._session(session_id, create=False)
+            if session is None:
+                return []
+            turns = list(session.turns)
+        return turns[-n:] if n else turns
+
+    def append(self, session_id: str, question: str, answer: str, source_file=None, docs_and_scores=()):
+        turn = Turn(
+            question, answer, source_file,
+            tuple(doc.id for doc, _ in docs_and_scores if doc.id),
+            tuple(float(score) for doc, score in docs_and_scores if doc.id),
+            time.time(),
+        )
+        with self._lock:
+            session = self._session(session_id, create=True)
+            if len(session.turns) == session.turns.maxlen:
+                session.bytes -= session.turns[0].size()
+                self.total_bytes -= session.turns[0].size()
+            session.turns.append(turn)
+            session.bytes += turn.size()
+            self.total_bytes += turn.size()
+            if self._conn is not None:
+                self._db().execute(
+                    "INSERT INTO turns (session_id, created_at, question, answer, source_file, chunk_ids, scores) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (session_id, turn.created_at, question, answer, source_file, json.dumps(turn.chunk_ids), json.dumps(turn.scores)),
+                )
+                # The table is a ring buffer too: older turns of this session are never read again
+                self._db().execute(
+                    "DELETE FROM turns WHERE session_id = ? AND id NOT IN "
+                    "(SELECT id FROM turns WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                    (session_id, session_id, self.max_turns),
+                )
+                self._db().commit()
+            self._evict(turn.created_at)
+
+    def prune_db(self):
+        """Delete persisted turns of sessions idle past `idle_seconds`."""
+        if self._conn is None:
+            return 0
+        with self._lock:
+            deleted = self._db().execute(
+                "DELETE FROM turns WHERE session_id IN (SELECT session_id FROM turns GROUP BY session_id HAVING MAX(created_at) < ?)",
+                (time.time() - self.idle_seconds,),
+            ).rowcount
+            self._db().commit()
+        return deleted
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "persistent": self._conn is not None,
+            }
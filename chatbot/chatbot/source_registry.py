@@ -0,0 +1,110 @@
+# source_registry.py
+
+import os
+import json
+import hashlib
+from dataclasses import dataclass, asdict
+from typing import Optional
+from urllib.parse import quote
+
+REGISTRY_FILE = "sources.json"
+
+
+def normalize_name(base_name: str) -> str:
+    # Base names contain dots ("10.1_OPS-01 ..."), so callers strip the extension, not this
+    return base_name.lower()
+
+
+def stat_etag(size, mtime) -> str:
+    """ETag from size and mtime alone, for files whose content hash is unknown or out of date."""
+    return f'"{int(mtime * 1_000_000):x}-{size:x}"'
+
+
+@dataclass(frozen=True)
+class SourceFile:
+    name: str
+    size: int
+    mtime: float
+    sha256: Optional[str]
+
+    @property
+    def url(self) -> str:
+        return f"/pdfs/{quote(self.name)}"
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.sha256[:32]}"' if self.sha256 else stat_etag(self.size, self.mtime)
+
+    def matches(self, stat) -> bool:
+        """Whether `stat` (of the file on disk now) still describes the file this entry was made from."""
+        return stat.st_size == self.size and stat.st_mtime == self.mtime
+
+
+class SourceRegistry:
+    """The original documents in PDF_DIR (file name, size, mtime, content hash), built once at ingest.
+
+    Saved next to the index it was built with, so the server answers "does this source exist?" and
+    "which original belongs to this cleaned file?" from a dict instead of the filesystem.
+    """
+
+    def __init__(self, files=()):
+        self.by_name = {entry.name: entry for entry in files}
+        self.by_key = {}
+        for entry in sorted(self.by_name.values(), key=lambda entry: entry.name):
+            # "Policy.docx" and "Policy.pdf": the first by name wins, deterministically
+            self.by_key.setdefault(normalize_name(os.path.splitext(entry.name)[0]), entry)
+
+    def __len__(self):
+        return len(self.by_name)
+
+    def get(self, name):
+        return self.by_name.get(name) if name else None
+
+    def match(self, base_name):
+        """The original whose name without extension equals `base_name` (case-insensitive), or None."""
+        return self.by_key.get(normalize_name(base_name))
+
+    def names_by_key(self):
+        # Plain dict for ingest's worker processes
+        return {key: entry.name for key, entry in self.by_key.items()}
+
+    @classmethod
+    def scan(cls, directory, previous=None, hash_files=True):
+        """Registry of every file in `directory`; hashes of files whose size and mtime are unchanged
+        since `previous` are reused instead of re-read. Without `hash_files` only stat() is used
+        (entries then carry no hash and their ETag comes from size and mtime)."""
+        files = []
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                path = os.path.join(directory, name)
+                if not os.path.isfile(path):
+                    continue
+                stat = os.stat(path)
+                known = previous.get(name) if previous is not None else None
+                if known and known.matches(stat):
+                    files.append(known)
+                    continue
+                if not hash_files:
+                    files.append(SourceFile(name, stat.st_size, stat.st_mtime, None))
+                    continue
+                digest = hashlib.sha256()
+                with open(path, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        digest.update(block)
+                files.append(SourceFile(name, stat.st_size, stat.st_mtime, digest.hexdigest()))
+        return cls(files)
+
+    def save(self, directory):
+        tmp_path = os.path.join(directory, REGISTRY_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([asdict(entry) for entry in self.by_name.values()], f, indent=2)
+        os.replace(tmp_path, os.path.join(directory, REGISTRY_FILE))
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, REGISTRY_FILE), encoding="utf-8") as f:
+            return cls(SourceFile(**entry) for entry in json.load(f))
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, REGISTRY_FILE))
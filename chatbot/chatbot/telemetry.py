@@ -0,0 +1,198 @@
+# telemetry.py
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=STAGE_BUCKETS, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0, 0.0]
+            # Counts are stored per bucket and made cumulative when rendered
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, count, total) in sorted(self._series.items()):
+                names = self.label_names + ("le",)
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f"{self.name}_bucket{_labels(names, label_values + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(names, label_values + ('+Inf',))} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class Collected:
+    """A gauge or counter read from somewhere else (cache stats, queue sizes) when /metrics is scraped.
+
+    `collect` returns {label value tuple: number}.
+    """
+
+    def __init__(self, name: str, help_text: str, kind: str, collect, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.collect = collect
+        self.label_names = tuple(label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for label_values, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+STAGE_SECONDS = registry.register(Histogram(
+    "chatbot_stage_duration_seconds", "Time spent per pipeline stage.", label_names=("stage",)
+))
+REQUEST_SECONDS = registry.register(Histogram(
+    "chatbot_request_duration_seconds", "End-to-end request latency.", label_names=("endpoint",)
+))
+REQUESTS = registry.register(Counter("chatbot_requests_total", "Requests by endpoint and outcome.", ("endpoint", "outcome")))
+LLM_TOKENS = registry.register(Counter("chatbot_llm_tokens_total", "Tokens processed by the LLM.", ("phase",)))
+LLM_SECONDS = registry.register(Counter("chatbot_llm_seconds_total", "Time the LLM spent on prompt evaluation and generation.", ("phase",)))
+LLM_TOKENS_PER_SECOND = registry.register(Histogram(
+    "chatbot_llm_generation_tokens_per_second", "Generation speed per LLM call.",
+    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 250),
+))
+
+
+class RequestTrace:
+    """Per-request stage timings and log fields, carried in a ContextVar so helpers deep in the
+    pipeline (and the threads/tasks they start) can add to it without passing it around."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.timings_ms = {}
+        self.fields = {}
+
+    def add_timing(self, stage: str, seconds: float):
+        # A stage can run more than once per request (e.g. two LLM calls); keep the total
+        self.timings_ms[stage] = round(self.timings_ms.get(stage, 0.0) + seconds * 1000, 2)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+_current_trace = ContextVar("request_trace", default=None)
+
+
+def start_trace(endpoint: str) -> RequestTrace:
+    trace = RequestTrace(endpoint)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def observe_stage(name: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, name)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_timing(name, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+def annotate(**fields):
+    """Attach fields to the current request's log record."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.fields.update(fields)
+
+
+def record_llm_usage(metadata, field="llm"):
+    """Token counts and timings Ollama reports with the final response chunk."""
+    metadata = metadata or {}
+    usage = {}
+    for phase, count_key, duration_key in (("prompt", "prompt_eval_count", "prompt_eval_duration"), ("completion", "eval_count", "eval_duration")):
+        count, duration = metadata.get(count_key), metadata.get(duration_key)
+        if count is None or duration is None:
+            continue
+        LLM_TOKENS.inc(count, phase)
+        LLM_SECONDS.inc(duration / 1e9, phase)
+        usage[f"{phase}_tokens"] = count
+        usage[f"{phase}_ms"] = round(duration / 1e6, 1)
+        if phase == "completion" and duration:
+            tokens_per_second = count / (duration / 1e9)
+            LLM_TOKENS_PER_SECOND.observe(tokens_per_second)
+            usage["tokens_per_s"] = round(tokens_per_second, 1)
+    if usage:
+        annotate(**{field: usage})
+    return usage
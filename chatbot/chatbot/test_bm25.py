@@ -0,0 +1,84 @@
+# test_bm25.py
+
+import pytest
+
+from bm25 import BM25Index, tokenize, reciprocal_rank_fusion
+
+DOCS = {
+    "leave": "Annual leave must be applied for two weeks in advance through the HR portal.",
+    "medical": "Medical leave needs a certificate from a registered doctor.",
+    "pantry": "Clean the pantry fridge every Friday and label your food.",
+    "mmp": "MMP-01-ANNEX II lists the controlled copies of the quality manual.",
+    "laptop": "Return the company laptop to IT on your last day.",
+}
+
+
+def build(ids):
+    index = BM25Index()
+    index.add(ids, [DOCS[doc_id] for doc_id in ids])
+    return index
+
+
+def test_tokenize_keeps_document_codes_and_their_parts():
+    assert tokenize("MMP-01-ANNEX II") == ["mmp-01-annex", "mmp-01", "mmp", "01", "annex", "ii"]
+
+
+def test_search_ranks_the_matching_chunk_first():
+    index = build(list(DOCS))
+    assert index.search("medical certificate", k=3)[0][0] == "medical"
+    assert index.search("MMP-01", k=3)[0][0] == "mmp"
+    assert index.search("nothing relevant here", k=3) == []
+
+
+def test_deleted_chunks_are_never_returned():
+    index = build(list(DOCS))
+    index.delete(["leave", "missing"])
+    assert len(index) == 4
+    assert all(doc_id != "leave" for doc_id, _ in index.search("leave", k=5))
+
+
+def test_compact_after_delete_scores_like_a_fresh_index():
+    index = build(list(DOCS))
+    index.delete(["leave", "pantry"])
+    index.compact()
+    survivors = ["medical", "mmp", "laptop"]
+    fresh = build(survivors)
+
+    assert index.doc_ids == survivors
+    assert index.row_of == {doc_id: row for row, doc_id in enumerate(survivors)}
+    for query in ("medical leave", "quality manual copies", "laptop last day"):
+        assert index.search(query, k=5) == pytest.approx(fresh.search(query, k=5))
+
+
+def test_re_adding_an_id_replaces_its_text():
+    index = build(list(DOCS))
+    index.add(["pantry"], ["Payroll is processed on the 25th of every month."])
+    assert len(index) == len(DOCS)
+    assert index.search("pantry fridge", k=5) == []
+    assert index.search("payroll", k=5)[0][0] == "pantry"
+
+
+def test_save_compacts_and_load_round_trips(tmp_path):
+    index = build(list(DOCS))
+    index.delete(["laptop"])
+    index.add(["extra"], ["Webmail autoresponder setup for holidays."])
+    index.save(str(tmp_path))
+
+    assert BM25Index.exists(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    assert loaded.doc_ids == index.doc_ids
+    for query in ("autoresponder", "annual leave", "laptop"):
+        assert loaded.search(query, k=5) == pytest.approx(index.search(query, k=5))
+
+
+def test_allowed_rows_filters_results():
+    index = build(list(DOCS))
+    allowed = index.alive.copy()
+    allowed[index.row_of["medical"]] = False
+    assert [doc_id for doc_id, _ in index.search("leave", k=5, allowed_rows=allowed)] == ["leave"]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "a", "d"]])
+    assert [doc_id for doc_id, _ in fused][:2] in (["a", "b"], ["b", "a"])
+    assert fused[-1][0] in ("c", "d")
@@ -0,0 +1,53 @@
+# test_context_builder.py
+
+from langchain_core.documents import Document
+
+from context_builder import ContextBuilder
+
+OVERLAP = "Staff must apply for annual leave through the HR portal."
+
+
+def doc(text, source="Leave.pdf", chunk_index=None):
+    metadata = {"source": source}
+    if chunk_index is not None:
+        metadata["chunk_index"] = chunk_index
+    return Document(page_content=text, metadata=metadata)
+
+
+def build(docs, max_tokens=1000):
+    return ContextBuilder(max_tokens, max_overlap_chars=200).build([(d, 0.0) for d in docs])
+
+
+def tokens(document):
+    return ContextBuilder(0, 0).count_tokens(document.page_content)
+
+
+def test_neighbouring_chunks_send_their_overlap_once():
+    first = doc(f"Leave starts in January. {OVERLAP}", chunk_index=0)
+    second = doc(f"{OVERLAP} Approval takes two days.", chunk_index=1)
+    context = build([second, first])
+    assert context.count(OVERLAP) == 1
+    assert context.index("January") < context.index("two days")
+
+
+def test_repeated_sentences_are_dropped_across_sources():
+    context = build([
+        doc(f"{OVERLAP} Leave starts in January.", source="Leave.pdf"),
+        doc(f"Interns follow the same rules. {OVERLAP}", source="Interns.pdf"),
+    ])
+    assert context.count(OVERLAP) == 1
+    assert "Interns follow the same rules." in context
+
+
+def test_budget_cuts_the_least_relevant_chunks_first():
+    best = doc("The notice period is one month for confirmed staff.", source="Resignation.pdf")
+    worst = doc("The pantry fridge is cleaned every Friday afternoon.", source="Pantry.pdf")
+    builder = ContextBuilder(max_tokens=tokens(best), max_overlap_chars=200)
+    context = builder.build([(best, 0.1), (worst, 0.9)])
+    assert "notice period" in context
+    assert "pantry" not in context
+
+
+def test_kept_sentences_stay_in_reading_order():
+    chunk = doc("First step. Second step. Third step.")
+    assert build([chunk]) == "First step. Second step. Third step."
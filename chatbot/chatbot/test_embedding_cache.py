@@ -0,0 +1,98 @@
+# test_embedding_cache.py
+
+import os
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+
+
+def vectors(n, dim=4, start=0):
+    return np.arange(start, start + n * dim, dtype=np.float32).reshape(n, dim)
+
+
+def test_rows_written_by_one_instance_are_read_by_another(tmp_path):
+    writer = EmbeddingCache(str(tmp_path), "model")
+    reader = EmbeddingCache(str(tmp_path), "model")
+    writer.put_many(["a", "b"], vectors(2))
+
+    # The reader opened before the file existed; it maps the new rows on its first miss
+    found = reader.get_many(["a", "b", "c"])
+    np.testing.assert_array_equal(found[0], vectors(2)[0])
+    np.testing.assert_array_equal(found[1], vectors(2)[1])
+    assert found[2] is None
+    assert os.path.exists(os.path.join(writer.directory, "vectors.lock"))
+
+
+def test_kind_and_model_are_part_of_the_key(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model")
+    cache.put_many(["a"], vectors(1), kind="document")
+    assert cache.get_many(["a"], kind="query") == [None]
+    assert EmbeddingCache(str(tmp_path), "other-model").get_many(["a"]) == [None]
+
+
+def test_torn_tail_is_trimmed_before_the_next_append(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model")
+    cache.put_many(["a", "b"], vectors(2))
+    record_size = cache._dtype.itemsize
+    # A writer that died mid-record leaves a partial record behind
+    with open(cache._records_path, "ab") as f:
+        f.write(b"\x01" * (record_size // 2))
+
+    reopened = EmbeddingCache(str(tmp_path), "model")
+    assert os.path.getsize(cache._records_path) == 2 * record_size
+    reopened.put_many(["c"], vectors(1, start=100))
+
+    fresh = EmbeddingCache(str(tmp_path), "model")
+    found = fresh.get_many(["a", "b", "c"])
+    np.testing.assert_array_equal(found[1], vectors(2)[1])
+    np.testing.assert_array_equal(found[2], vectors(1, start=100)[0])
+
+
+def test_torn_tail_left_after_open_is_trimmed_by_the_writer(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model")
+    cache.put_many(["a"], vectors(1))
+    with open(cache._records_path, "ab") as f:
+        f.write(b"\x01" * 3)
+
+    cache.put_many(["b"], vectors(1, start=50))
+    assert os.path.getsize(cache._records_path) == 2 * cache._dtype.itemsize
+    found = EmbeddingCache(str(tmp_path), "model").get_many(["a", "b"])
+    np.testing.assert_array_equal(found[1], vectors(1, start=50)[0])
+
+
+def test_max_rows_starts_the_file_afresh_for_every_reader(tmp_path):
+    writer = EmbeddingCache(str(tmp_path), "model", name="queries", max_rows=2)
+    reader = EmbeddingCache(str(tmp_path), "model", name="queries", max_rows=2)
+    writer.put_many(["a", "b"], vectors(2))
+    assert reader.get_many(["a"])[0] is not None
+
+    writer.put_many(["c"], vectors(1, start=100))
+    assert writer.get_many(["a", "b"]) == [None, None]
+    # The reader still maps the old file; a miss makes it notice the new one and drop the old rows
+    found = reader.get_many(["c", "a"])
+    np.testing.assert_array_equal(found[0], vectors(1, start=100)[0])
+    assert found[1] is None
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return [float(len(text)), 0.0]
+
+
+def test_cached_embeddings_only_encode_misses(tmp_path):
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings(lambda: model, EmbeddingCache(str(tmp_path), "model"))
+    embeddings.embed_documents(["one", "two"])
+    assert embeddings.embed_documents(["two", "three", "three"]) == [[3.0, 1.0], [5.0, 1.0], [5.0, 1.0]]
+    assert model.calls == [["one", "two"], ["three"]]
+    assert embeddings.embed_query("two") == [3.0, 0.0]
+    assert (embeddings.hits, embeddings.misses) == (2, 4)
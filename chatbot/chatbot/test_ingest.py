@@ -0,0 +1,111 @@
+# test_ingest.py
+
+import os
+import hashlib
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+
+import ingest
+from bm25 import BM25Index
+from index_snapshots import current_index_dir
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic bag-of-words vectors, so the tests need no model."""
+
+    def __init__(self, dim=64):
+        self.dim = dim
+
+    def embed_query(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int.from_bytes(hashlib.sha1(word.encode()).digest()[:4], "little") % self.dim] += 1.0
+        return (vector / max(np.linalg.norm(vector), 1e-9)).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def write_doc(directory, name, topic, sentences=40):
+    text = " ".join(f"{topic} rule {i} says step {i * 7 % 13} applies to {topic} case {i}." for i in range(sentences))
+    with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    cleaned = tmp_path / "Cleaned"
+    cleaned.mkdir()
+    (tmp_path / "pdfs").mkdir()
+    embeddings = HashingEmbeddings()
+    monkeypatch.setattr(ingest, "CLEANED_DIR", str(cleaned))
+    monkeypatch.setattr(ingest, "PDF_DIR", str(tmp_path / "pdfs"))
+    monkeypatch.setattr(ingest, "VECTORSTORE_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(ingest, "INGEST_SOURCES", "cleaned")
+    monkeypatch.setattr(ingest, "make_embeddings", lambda *args, **kwargs: embeddings)
+    os.makedirs(tmp_path / "index")
+    for name, topic in [("leave.txt", "leave"), ("pantry.txt", "pantry"), ("laptop.txt", "laptop"), ("payroll.txt", "payroll")]:
+        write_doc(str(cleaned), name, topic)
+    return cleaned, embeddings
+
+
+def load_current(embeddings):
+    directory = current_index_dir(ingest.VECTORSTORE_DIR)
+    return directory, FAISS.load_local(directory, embeddings, allow_dangerous_deserialization=True)
+
+
+def assert_consistent(directory, store, embeddings):
+    """Every chunk comes back as its own top hit, and the index, docstore, BM25 and manifest agree."""
+    ids = list(store.index_to_docstore_id.values())
+    assert store.index.ntotal == len(ids) == len(set(ids))
+    for doc_id in ids:
+        text = store.docstore.search(doc_id).page_content
+        (doc, _), = store.similarity_search_with_score_by_vector(embeddings.embed_query(text), k=1)
+        assert doc.id == doc_id
+
+    manifest = ingest.load_manifest(directory)
+    assert sorted(cid for entry in manifest["files"].values() for cid in entry["chunk_ids"]) == sorted(ids)
+    assert sorted(BM25Index.load(directory).doc_ids) == sorted(ids)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw"])
+def test_incremental_ingest_round_trip(corpus, monkeypatch, index_type):
+    cleaned, embeddings = corpus
+    monkeypatch.setattr(ingest, "FAISS_INDEX_TYPE", index_type)
+    ingest.ingest_documents(incremental=False, workers=1)
+    first_dir, first = load_current(embeddings)
+    assert_consistent(first_dir, first, embeddings)
+
+    # One file edited, one removed and one added since the last run
+    write_doc(str(cleaned), "pantry.txt", "fridge", sentences=55)
+    os.remove(cleaned / "laptop.txt")
+    write_doc(str(cleaned), "meeting.txt", "meeting", sentences=30)
+    ingest.ingest_documents(incremental=True, workers=1)
+
+    directory, store = load_current(embeddings)
+    assert directory != first_dir
+    assert_consistent(directory, store, embeddings)
+    sources = {doc.metadata["source"] for doc in store.docstore._dict.values()}
+    assert sources == {"leave.docx", "pantry.docx", "payroll.docx", "meeting.docx"}
+    assert not any("laptop" in doc.page_content for doc in store.docstore._dict.values())
+    # The published snapshot the incremental run started from was left untouched
+    assert_consistent(first_dir, FAISS.load_local(first_dir, embeddings, allow_dangerous_deserialization=True), embeddings)
+
+
+def test_unchanged_corpus_publishes_nothing_new(corpus):
+    _, embeddings = corpus
+    ingest.ingest_documents(incremental=False, workers=1)
+    directory, _ = load_current(embeddings)
+    ingest.ingest_documents(incremental=True, workers=1)
+    assert load_current(embeddings)[0] == directory
+
+
+def test_only_flat_indexes_support_removal():
+    from index_factory import build_index, supports_removal
+
+    vectors = np.random.default_rng(0).standard_normal((100, 8)).astype(np.float32)
+    assert supports_removal(build_index(vectors, "flat"))
+    assert not supports_removal(build_index(vectors, "ivf_flat", nlist=2))
+    assert not supports_removal(build_index(vectors, "hnsw", hnsw_m=4))
@@ -0,0 +1,68 @@
+# test_llm_gate.py
+
+import asyncio
+import pytest
+
+from llm_gate import LLMGate, LLMQueueFull
+
+
+async def hold(gate, release, entered=None):
+    async with gate.slot():
+        if entered is not None:
+            entered.set()
+        await release.wait()
+
+
+def test_admits_up_to_concurrency_plus_queue_then_refuses():
+    async def scenario():
+        gate = LLMGate(max_concurrency=1, max_waiting=1)
+        release, entered = asyncio.Event(), asyncio.Event()
+        running = asyncio.create_task(hold(gate, release, entered))
+        await entered.wait()
+        queued = asyncio.create_task(hold(gate, release))
+        await asyncio.sleep(0)
+        assert (gate.active, gate.waiting) == (1, 1)
+        assert gate.is_full()
+
+        with pytest.raises(LLMQueueFull):
+            async with gate.slot():
+                pass
+
+        release.set()
+        await asyncio.gather(running, queued)
+        assert (gate.active, gate.waiting) == (0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_waiting_past_the_timeout_is_refused_and_frees_the_queue_spot():
+    async def scenario():
+        gate = LLMGate(max_concurrency=1, max_waiting=1, wait_timeout=0.05)
+        release, entered = asyncio.Event(), asyncio.Event()
+        running = asyncio.create_task(hold(gate, release, entered))
+        await entered.wait()
+
+        with pytest.raises(LLMQueueFull):
+            async with gate.slot():
+                pass
+        assert (gate.active, gate.waiting) == (1, 0)
+
+        release.set()
+        await running
+        async with gate.slot():
+            assert gate.active == 1
+
+    asyncio.run(scenario())
+
+
+def test_slot_is_released_when_the_call_fails():
+    async def scenario():
+        gate = LLMGate(max_concurrency=1, max_waiting=0)
+        with pytest.raises(RuntimeError):
+            async with gate.slot():
+                raise RuntimeError("ollama went away")
+        async with gate.slot():
+            assert gate.active == 1
+        assert gate.active == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,82 @@
+# test_session_store.py
+
+import time
+from langchain_core.documents import Document
+
+from session_store import SessionStore
+
+
+def make_store(db_path=None, max_turns=3, idle_seconds=3600, max_sessions=100, max_bytes=10 ** 6):
+    return SessionStore(max_turns, idle_seconds, max_sessions, max_bytes, str(db_path) if db_path else None)
+
+
+def questions(turns):
+    return [turn.question for turn in turns]
+
+
+def test_keeps_only_the_last_turns():
+    store = make_store()
+    for i in range(5):
+        store.append("s", f"q{i}", f"a{i}")
+    assert questions(store.recent("s")) == ["q2", "q3", "q4"]
+    assert questions(store.recent("s", 1)) == ["q4"]
+    assert store.recent("unknown") == []
+    assert store.snapshot()["sessions"] == 1
+
+
+def test_turn_keeps_the_grounding_chunks():
+    store = make_store()
+    docs = [(Document(page_content="x", id="a::1::0"), 0.2), (Document(page_content="y"), 0.5)]
+    store.append("s", "q", "a", "Leave.pdf", docs)
+    turn, = store.recent("s")
+    assert (turn.source_file, turn.chunk_ids, turn.scores) == ("Leave.pdf", ("a::1::0",), (0.2,))
+
+
+def test_least_recently_used_sessions_are_evicted():
+    store = make_store(max_sessions=2)
+    store.append("a", "q", "a")
+    store.append("b", "q", "a")
+    store.recent("a")
+    store.append("c", "q", "a")
+    assert store.recent("b") == []
+    assert questions(store.recent("a")) == ["q"]
+    assert store.snapshot()["evictions"] == 1
+
+
+def test_byte_cap_is_tracked_through_the_ring_buffer():
+    store = make_store(max_turns=2)
+    for i in range(10):
+        store.append("s", "q", "a" * 100)
+    assert store.snapshot()["bytes"] == sum(turn.size() for turn in store.recent("s"))
+
+
+def test_idle_sessions_expire(monkeypatch):
+    store = make_store(idle_seconds=60)
+    store.append("s", "q", "a")
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert store.recent("s") == []
+
+
+def test_two_stores_on_one_database_share_sessions(tmp_path):
+    # What two serve.py workers see with SESSION_DB_PATH set
+    first = make_store(tmp_path / "sessions.sqlite")
+    second = make_store(tmp_path / "sessions.sqlite")
+    first.append("s", "q1", "a1")
+    assert questions(second.recent("s")) == ["q1"]
+    second.append("s", "q2", "a2")
+    first.append("s", "q3", "a3")
+    first.append("s", "q4", "a4")
+    assert questions(second.recent("s")) == ["q2", "q3", "q4"]
+    assert questions(first.recent("s")) == ["q2", "q3", "q4"]
+
+
+def test_sessions_survive_a_restart_and_prune_drops_idle_ones(tmp_path, monkeypatch):
+    make_store(tmp_path / "sessions.sqlite", idle_seconds=60).append("s", "q", "a")
+    assert questions(make_store(tmp_path / "sessions.sqlite").recent("s")) == ["q"]
+
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    store = make_store(tmp_path / "sessions.sqlite", idle_seconds=60)
+    assert store.prune_db() == 1
+    assert store.recent("s") == []
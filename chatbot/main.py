@@ -2,18 +2,63 @@
 
 import os
 import re
+import json
+import time
+import asyncio
 import traceback
-from datetime import datetime
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
 from urllib.parse import quote
-from fastapi import FastAPI
+from contextvars import ContextVar
+from fastapi import FastAPI, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from typing import Optional
+from pydantic import BaseModel, Field
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from chatbot.rag_chain import load_chain
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from chatbot.llm_loader import llama_pipeline
-from chatbot.config import MAX_ANSWER_WORDS, PDF_DIR
-from rapidfuzz import fuzz
+from chatbot.config import (
+    MAX_ANSWER_WORDS, PDF_DIR, LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT, HR_GATE_MODE,
+    INTENT_CLASSIFIER_ENABLED, HR_INTENT_LOW, HR_INTENT_HIGH, PERSONAL_INTENT_THRESHOLD,
+    PERSONAL_KEYWORD_THRESHOLD, INTENT_LLM_FALLBACK, VECTORSTORE_DIR, ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL, ANSWER_CACHE_SIMILARITY,
+    EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_DIR, EMBEDDING_MODEL_NAME, IVF_NPROBE, HNSW_EF_SEARCH,
+    VECTORSTORE_LOAD_MODE, EMBED_NORMALIZE, HYBRID_SEARCH_ENABLED, HYBRID_CANDIDATES, RRF_K,
+    HYBRID_DENSE_WEIGHT, HYBRID_SPARSE_WEIGHT, METADATA_FILTER_FIELDS, RERANK_ENABLED, RERANK_MODEL,
+    RERANK_CANDIDATES, RERANK_TOP_N, RERANK_BATCH_SIZE, RERANK_BUDGET_MS, CONTEXT_PACKING_ENABLED,
+    CONTEXT_MAX_TOKENS, CONTEXT_TOKENIZER, CHUNK_OVERLAP, OLLAMA_KEEP_ALIVE, CONTEXT_BLOCK_CACHE_SIZE,
+    QUERY_BATCHING_ENABLED, QUERY_BATCH_MAX_SIZE, QUERY_BATCH_MAX_WAIT_MS, SESSION_MAX_TURNS,
+    SESSION_IDLE_SECONDS, SESSION_MAX_SESSIONS, SESSION_MAX_BYTES, SESSION_DB_PATH, SESSION_CONTEXT_TURNS,
+    REQUEST_LOG_PATH, REQUEST_LOG_MAX_BYTES, REQUEST_LOG_BACKUPS, REQUEST_LOG_FLUSH_INTERVAL,
+    EMBEDDING_QUERY_CACHE_MAX_ROWS, KEYWORDS_FILE, HR_FUZZY_THRESHOLD, INDEX_RELOAD_POLL_SECONDS, ADMIN_TOKEN, EMBEDDING_BACKEND,
+    ONNX_MODEL_DIR, ONNX_QUANTIZED, ONNX_THREADS, ONNX_MAX_LENGTH, WARMUP_QUESTION, WARMUP_LLM_PING,
+    WARMUP_RETRY_SECONDS,
+)
+from chatbot.context_builder import ContextBuilder
+from chatbot.prompts import SYSTEM_MESSAGE, format_context, grounded_messages
+from chatbot.reranker import CrossEncoderReranker
+from chatbot.metadata_index import MetadataIndex
+from chatbot.query_batcher import QueryBatcher
+from chatbot.session_store import SessionStore
+from chatbot.request_log import RequestLogger
+from chatbot.keyword_matcher import KeywordMatcher, PatternMatcher, load_keyword_sets
+from chatbot.telemetry import (
+    registry, Collected, REQUEST_SECONDS, REQUESTS, stage, observe_stage, annotate, start_trace,
+    current_trace, record_llm_usage,
+)
+from chatbot.bm25 import BM25Index, reciprocal_rank_fusion
+from chatbot.lazy_store import load_mmap_vectorstore
+from chatbot.index_snapshots import current_version, current_index_dir
+from chatbot.source_registry import SourceRegistry, stat_etag
+from chatbot import embedding_backend
+from chatbot.index_factory import set_search_params
+from chatbot.answer_cache import AnswerCache
+from chatbot.embedding_cache import EmbeddingCache, CachedEmbeddings
+from chatbot.intent_classifier import IntentClassifier
+from chatbot.llm_gate import LLMGate, LLMQueueFull
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage
+from langchain_community.vectorstores import FAISS
 
 app = FastAPI()
 
@@ -26,15 +71,177 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-qa_chain, vectorstore = load_chain()
-chat_history = []
+def current_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+class IndexState:
+    """One loaded index version: the vector store plus the BM25 and metadata indexes of the same snapshot."""
+
+    def __init__(self, vectorstore, directory, version):
+        self.vectorstore = vectorstore
+        self.directory = directory
+        self.version = version
+        set_search_params(vectorstore.index, IVF_NPROBE, HNSW_EF_SEARCH)
+        self.bm25 = BM25Index.load(directory) if HYBRID_SEARCH_ENABLED and BM25Index.exists(directory) else None
+        self.metadata = MetadataIndex.from_vectorstore(vectorstore, METADATA_FILTER_FIELDS)
+        # Indexes built before the registry existed: list PDF_DIR instead (stat only, nothing is hashed)
+        self.sources = SourceRegistry.load(directory) if SourceRegistry.exists(directory) else SourceRegistry.scan(PDF_DIR, hash_files=False)
+
+def open_index(directory, version, embeddings):
+    if VECTORSTORE_LOAD_MODE == "mmap":
+        vectorstore = load_mmap_vectorstore(directory, embeddings)
+    else:
+        vectorstore = FAISS.load_local(directory, embeddings, allow_dangerous_deserialization=True)
+    return IndexState(vectorstore, directory, version)
+
+def load_initial_index():
+    version = current_version(VECTORSTORE_DIR)
+    if version is None and VECTORSTORE_LOAD_MODE != "mmap" and EMBEDDING_BACKEND == "torch":
+        # Index written before snapshots existed: load it the way the chain always has
+        from chatbot.rag_chain import load_chain
+
+        _, vectorstore = load_chain()
+        embeddings = vectorstore.embedding_function
+    else:
+        vectorstore = None
+        # With the ONNX backend nothing on this path imports torch
+        embeddings = embedding_backend.load_embedding_model(
+            EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME, EMBED_NORMALIZE, onnx_dir=ONNX_MODEL_DIR,
+            quantized=ONNX_QUANTIZED, max_length=ONNX_MAX_LENGTH, threads=ONNX_THREADS,
+        )
+    if EMBEDDING_CACHE_ENABLED:
+        # Repeated questions skip query encoding entirely
+        model_id = embedding_backend.cache_model_id(EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, ONNX_QUANTIZED, EMBED_NORMALIZE)
+        query_cache = EmbeddingCache(EMBEDDING_CACHE_DIR, model_id, "queries", EMBEDDING_QUERY_CACHE_MAX_ROWS)
+        embeddings = CachedEmbeddings(embeddings, EmbeddingCache(EMBEDDING_CACHE_DIR, model_id), query_cache)
+    if vectorstore is None:
+        return open_index(current_index_dir(VECTORSTORE_DIR), version, embeddings)
+    vectorstore.embedding_function = embeddings
+    return IndexState(vectorstore, VECTORSTORE_DIR, None)
+
+load_started = time.perf_counter()
+index_state = load_initial_index()
+rss = current_rss_mb()
+print(
+    f"🚀 Vector store loaded ({VECTORSTORE_LOAD_MODE}, version {index_state.version or 'unversioned'}) "
+    f"in {time.perf_counter() - load_started:.2f}s"
+    + (f", RSS {rss:.0f} MB" if rss is not None else "")
+)
+_request_index = ContextVar("request_index", default=None)
+reload_lock = asyncio.Lock()
+# Concurrent questions share one embedding forward pass and one FAISS search
+query_batcher = QueryBatcher(QUERY_BATCH_MAX_SIZE, QUERY_BATCH_MAX_WAIT_MS) if QUERY_BATCHING_ENABLED else None
+reranker = CrossEncoderReranker(RERANK_MODEL, RERANK_BATCH_SIZE) if RERANK_ENABLED else None
+context_builder = ContextBuilder(CONTEXT_MAX_TOKENS, CHUNK_OVERLAP * 2, CONTEXT_TOKENIZER) if CONTEXT_PACKING_ENABLED else None
+sessions = SessionStore(SESSION_MAX_TURNS, SESSION_IDLE_SECONDS, SESSION_MAX_SESSIONS, SESSION_MAX_BYTES, SESSION_DB_PATH)
+sessions.prune_db()
+request_log = RequestLogger(REQUEST_LOG_PATH, REQUEST_LOG_MAX_BYTES, REQUEST_LOG_BACKUPS, REQUEST_LOG_FLUSH_INTERVAL)
+# keep_alive keeps the model loaded, so the fixed system message's KV prefix survives between requests
+chat_llm = llama_pipeline.bind(keep_alive=OLLAMA_KEEP_ALIVE)
+context_blocks = OrderedDict()
+llm_gate = LLMGate(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT)
+# Reuses the retriever's embedding model, so scoring a question costs one encode, not a generation
+intent_classifier = IntentClassifier(index_state.vectorstore.embeddings) if INTENT_CLASSIFIER_ENABLED else None
+answer_cache = AnswerCache(
+    ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL, ANSWER_CACHE_SIMILARITY, index_state.directory
+) if ANSWER_CACHE_ENABLED else None
+
+def pin_index():
+    """Keep this request on the index version it started with, even if a reload swaps it meanwhile."""
+    _request_index.set(index_state)
+
+def current_index() -> IndexState:
+    return _request_index.get() or index_state
+
+async def reload_index(force=False):
+    """Load the published snapshot off the event loop and swap it in with one assignment.
+
+    Requests already running keep the IndexState they pinned, so they finish on the old version.
+    Returns the load time in seconds, or None when there was nothing new to load.
+    """
+    global index_state
+    async with reload_lock:
+        version = current_version(VECTORSTORE_DIR)
+        if not force and version == index_state.version:
+            return None
+        started = time.perf_counter()
+        embeddings = index_state.vectorstore.embedding_function
+        new_state = await asyncio.to_thread(open_index, current_index_dir(VECTORSTORE_DIR), version, embeddings)
+        index_state = new_state
+        context_blocks.clear()
+        if answer_cache is not None:
+            # Answers grounded in the old snapshot are dropped on the next lookup
+            answer_cache.index_dir = new_state.directory
+        seconds = time.perf_counter() - started
+        print(f"🔄 Switched to index version {version or 'unversioned'} in {seconds:.2f}s")
+        return seconds
+
+async def watch_index_versions():
+    while True:
+        await asyncio.sleep(INDEX_RELOAD_POLL_SECONDS)
+        try:
+            await reload_index()
+        except Exception:
+            # Keep serving the current version; the next poll tries again
+            print("❌ Index reload failed")
+            traceback.print_exc()
+
+def cache_metrics():
+    values = {}
+    if answer_cache is not None:
+        stats = answer_cache.snapshot()
+        values[("answer", "hit")] = stats["exact_hits"] + stats["semantic_hits"]
+        values[("answer", "miss")] = stats["misses"]
+    embeddings = index_state.vectorstore.embedding_function
+    if isinstance(embeddings, CachedEmbeddings):
+        values[("embedding", "hit")] = embeddings.hits
+        values[("embedding", "miss")] = embeddings.misses
+    return values
+
+def queue_metrics():
+    values = {("llm_running",): llm_gate.active, ("llm_waiting",): llm_gate.waiting, ("request_log",): request_log.pending()}
+    if query_batcher is not None:
+        values[("query_batch",)] = query_batcher.snapshot()["waiting"]
+    return values
+
+registry.register(Collected("chatbot_cache_lookups_total", "Cache lookups by cache and result.", "counter", cache_metrics, ("cache", "result")))
+registry.register(Collected("chatbot_queue_depth", "Work currently queued or running.", "gauge", queue_metrics, ("queue",)))
+registry.register(Collected("chatbot_sessions", "Conversation sessions held in memory.", "gauge", lambda: {(): sessions.snapshot()["sessions"]}))
 
 # Mount folders
 app.mount("/static", StaticFiles(directory="static"), name="static")
-app.mount("/pdfs", StaticFiles(directory=PDF_DIR), name="pdfs")
+
+# Compiled once; HR can extend the lists in keywords.json without touching the code
+keyword_sets = load_keyword_sets(KEYWORDS_FILE)
+hr_keywords = KeywordMatcher(keyword_sets["hr_keywords"], HR_FUZZY_THRESHOLD)
+personal_keywords = KeywordMatcher(keyword_sets["personal_keywords"])
+rejection_patterns = PatternMatcher(keyword_sets["rejection_patterns"])
 
 class Question(BaseModel):
     question: str
+    session_id: Optional[str] = Field(default=None, max_length=64)
+
+PERSONAL_REJECTION_ANSWER = (
+    "Sorry I am not qualified to answer this question as I am only designed to assist with Verztec's internal policies and HR-related queries. "
+    "For personal matters, I would recommend speaking to someone you trust or seek professional help."
+)
+
+BUSY_ANSWER = "The assistant is busy right now, please try again in a moment."
+
+SCORE_THRESHOLD = 0.38
+
+# Connective or pronoun first: "what about interns?", "and how long does that take?", "it applies to contractors too?"
+FOLLOW_UP_RE = re.compile(
+    r"^(and|also|then|so|but|or|what about|how about|what if|it|its|it's|that|that's|this|those|these|they|them|there|same)\b",
+    re.IGNORECASE,
+)
 
 def truncate_answer(answer, max_words=MAX_ANSWER_WORDS):
     words = answer.split()
@@ -45,162 +252,633 @@ def truncate_answer(answer, max_words=MAX_ANSWER_WORDS):
     return truncated + "..."
 
 def is_rejection_response(text: str) -> bool:
-    text = text.lower()
-    patterns = [
-        r"i'?m not (qualified|able|equipped) to provide (a )?response",
-        r"document (does not|doesn’t) (address|mention).*(personal|family)",
-        r"recommend (seeking|speaking|getting).*(help|support|advice)",
-        r"i can’t provide (guidance|support|advice)",
-        r"this is beyond (my|the document's) scope",
-        r"not able to help (with )?(that|this question)",
-    ]
-    return any(re.search(p, text) for p in patterns)
+    return rejection_patterns.search(text)
+
+class StreamingAnswer:
+    """Incremental counterpart of truncate_answer + is_rejection_response for token streams."""
+
+    def __init__(self, max_words=MAX_ANSWER_WORDS):
+        self.max_words = max_words
+        self.text = ""
+        self.done = False
+        self.rejected = False
+        self._checked_upto = 0
+        self._words = 0
+
+    def feed(self, token: str) -> str:
+        """Add a token and return the part that may be sent to the client ("" once the word limit is hit)."""
+        if self.done or not token:
+            return ""
+        # Running count of len(self.text.split()), so each token costs O(len(token))
+        words = len(token.split())
+        if words and self.text and not self.text[-1].isspace() and not token[0].isspace():
+            words -= 1  # the token continues the last word
+        self._words += words
+        self.text += token
+        if self._words > self.max_words:
+            # Keep the overflowing token so truncate_answer() sees more than max_words
+            self.done = True
+            return ""
+        # Only re-run the rejection regexes once a sentence has been completed
+        if not self.rejected and re.search(r"[.!?\n]", token):
+            self._check_rejection()
+        return token
+
+    def _check_rejection(self):
+        if is_rejection_response(self.text):
+            self.rejected = True
+        self._checked_upto = len(self.text)
+
+    @property
+    def answer(self) -> str:
+        if not self.rejected and self._checked_upto < len(self.text):
+            self._check_rejection()
+        return truncate_answer(self.text, self.max_words)
 
 def is_personal_question(question: str) -> bool:
-    personal_keywords = [
-        "father", "mother", "brother", "sister", "family", "boyfriend", "girlfriend",
-        "relationship", "love", "hate", "angry", "feel", "emotional", "personal", "sad",
-        "why is my", "mental health", "feeling"
-    ]
-    return any(word in question.lower() for word in personal_keywords)
+    keyword_hit = personal_keywords.exact(question) is not None
+    if intent_classifier is None:
+        return keyword_hit
 
-def is_hr_query(question: str, use_fuzzy=True) -> bool:
-    keywords = [
-        "leave", "policy", "hr", "human resource", "benefits", "meeting", "procedure",
-        "onboarding", "offboarding", "sop", "salary", "promotion", "resignation",
-        "complaint", "roles", "pantry", "email etiquette", "company policy", "form",
-        "employee", "attendance", "audit", "feedback", "payroll", "document", "workflow",
-        "cover page", "quality manual", "quality procedure", "controlled copy", "uncontrolled copy"
-    ]
-    question = question.lower()
-    for kw in keywords:
-        if kw in question:
-            return True
-        if use_fuzzy and fuzz.partial_ratio(kw, question) >= 80:
-            return True
-    return False
+    # A keyword alone ("I feel the leave form is confusing") is not enough, the embedding score has to agree
+    score = intent_classifier.personal_score(question)
+    threshold = PERSONAL_KEYWORD_THRESHOLD if keyword_hit else PERSONAL_INTENT_THRESHOLD
+    return score >= threshold
 
-def is_hr_question_via_llm(query: str) -> bool:
+def is_hr_query(question: str, use_fuzzy=True) -> bool:
+    return hr_keywords.matches(question, use_fuzzy)
+
+async def generate(prompt, stage_name="generate"):
+    queued = time.perf_counter()
+    async with llm_gate.slot():
+        observe_stage("llm_wait", time.perf_counter() - queued)
+        with stage(stage_name):
+            result = await chat_llm.ainvoke(prompt)
+    # Prefill (prompt_eval) and generation timings as reported by Ollama
+    record_llm_usage(result.response_metadata, "llm" if stage_name == "generate" else f"llm_{stage_name}")
+    return result
+
+async def is_hr_question_via_llm(query: str) -> bool:
     prompt = f"""Is the following question related to Human Resources, company policies, internal procedures, or work etiquette?
 
     Question: "{query}"
 
     Respond with only "Yes" or "No"."""
-    result = llama_pipeline.invoke(prompt)
+    result = await generate(prompt, "classify_llm")
     return "yes" in result.content.lower()
 
+async def is_hr_question(query: str) -> bool:
+    if intent_classifier is None:
+        return await is_hr_question_via_llm(query)
+
+    with stage("classify"):
+        score = await asyncio.to_thread(intent_classifier.hr_score, query)
+    annotate(hr_score=round(score, 3))
+    if score >= HR_INTENT_HIGH:
+        return True
+    if score <= HR_INTENT_LOW or not INTENT_LLM_FALLBACK:
+        return score >= 0.5
+    # Low confidence: let the LLM decide
+    return await is_hr_question_via_llm(query)
+
+async def dense_search(question_text: str, k: int, where=None):
+    index = current_index()
+    if query_batcher is None:
+        if not where:
+            with stage("search"):
+                return await index.vectorstore.asimilarity_search_with_score(question_text, k=k)
+        with stage("embed"):
+            query_vector = await asyncio.to_thread(index.vectorstore.embeddings.embed_query, question_text)
+    elif not where:
+        _, docs_and_scores = await query_batcher.search(index.vectorstore, question_text, k)
+        return docs_and_scores
+    else:
+        # Filtered searches need their own IDSelector, so only the encoding is batched
+        query_vector = await query_batcher.embed(index.vectorstore, question_text)
+    with stage("search"):
+        return await asyncio.to_thread(index.metadata.search, index.vectorstore, query_vector, k, where)
+
+def fuse_results(dense, lexical, k: int):
+    """Dense + BM25 candidates fused with reciprocal rank fusion.
+
+    Chunks found only by BM25 (exact codes like "PSC-01") carry the best dense score, so the
+    SCORE_THRESHOLD check in plan_answer still judges the query by its dense match.
+    """
+    dense_by_id = {doc.id: (doc, score) for doc, score in dense}
+    fused = reciprocal_rank_fusion(
+        [[doc.id for doc, _ in dense], [doc_id for doc_id, _ in lexical]],
+        k=RRF_K,
+        weights=[HYBRID_DENSE_WEIGHT, HYBRID_SPARSE_WEIGHT],
+    )
+
+    top_dense_score = dense[0][1] if dense else 0.0
+    docs_and_scores = []
+    for doc_id, _ in fused:
+        if doc_id in dense_by_id:
+            docs_and_scores.append(dense_by_id[doc_id])
+        else:
+            doc = current_index().vectorstore.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                docs_and_scores.append((doc, top_dense_score))
+        if len(docs_and_scores) == k:
+            break
+    return docs_and_scores
+
+def lexical_search(question_text: str, where=None):
+    index = current_index()
+    with stage("bm25"):
+        allowed_rows = index.metadata.bm25_mask(index.bm25, where) if where else None
+        return index.bm25.search(question_text, HYBRID_CANDIDATES, allowed_rows)
+
+async def hybrid_search(question_text: str, k: int, where=None):
+    dense, lexical = await asyncio.gather(
+        dense_search(question_text, HYBRID_CANDIDATES, where),
+        asyncio.to_thread(lexical_search, question_text, where),
+    )
+    return await asyncio.to_thread(fuse_results, dense, lexical, k)
+
+def metadata_filter_for(question_text: str):
+    user_query = question_text.lower()
+
+    is_physical = any(term in user_query for term in ["physical meeting", "in person", "face to face", "onsite"])
+    is_digital = any(term in user_query for term in ["digital meeting", "online meeting", "virtual meeting", "zoom", "teams"])
+
+    if is_physical:
+        return {"doc_type": "physical"}
+    if is_digital:
+        return {"doc_type": "digital"}
+    return None
+
+def rerank_documents(question_text: str, docs_and_scores):
+    with stage("rerank"):
+        reranked_docs, reranked = reranker.rerank(question_text, docs_and_scores, RERANK_TOP_N, RERANK_BUDGET_MS)
+    if not reranked and len(docs_and_scores) > 1:
+        # Budget exceeded, retrieval order kept
+        annotate(rerank_skipped=True)
+    return reranked_docs
+
+async def search_documents(question_text: str):
+    # The doc_type filter is applied inside the search, so top-k is chosen among matching chunks only
+    where = metadata_filter_for(question_text)
+    # With a reranker, retrieve a wider candidate set and let it pick the best few
+    k = RERANK_CANDIDATES if reranker is not None else 3
+    if current_index().bm25 is not None:
+        docs_and_scores = await hybrid_search(question_text, k, where)
+    else:
+        docs_and_scores = await dense_search(question_text, k, where)
+
+    if reranker is not None:
+        docs_and_scores = await asyncio.to_thread(rerank_documents, question_text, docs_and_scores)
+    return docs_and_scores
+
+async def retrieve_documents(question_text: str):
+    """The question's documents, or None when the HR gate rejected it (an empty list only means nothing was found)."""
+    # Only retrieve docs if it's HR-related
+    is_hr_like = is_hr_query(question_text)
+
+    if HR_GATE_MODE == "serial":
+        is_llm_hr = await is_hr_question(question_text)
+        if is_hr_like or is_llm_hr:
+            return await search_documents(question_text)
+        return None
+
+    # Keyword/fuzzy hit is enough: no need to run the classifier
+    if is_hr_like:
+        return await search_documents(question_text)
+
+    # Otherwise classify and search at the same time, and drop the docs if the classifier says no
+    is_llm_hr, docs_and_scores = await asyncio.gather(
+        is_hr_question(question_text),
+        search_documents(question_text),
+    )
+    return docs_and_scores if is_llm_hr else None
+
+def context_block(docs_and_scores) -> str:
+    """The packed document context, cached by the snapshot and the chunk IDs it was built from in
+    retrieval order (the order decides which chunks are cut when the budget runs out)."""
+    ids = [doc.id for doc, _ in docs_and_scores]
+    # Chunk IDs are file hash + position only, so a snapshot re-chunked with new CHUNK_SIZE/OVERLAP reuses them
+    key = (current_index().version, *ids) if all(ids) else None
+    if key is not None and key in context_blocks:
+        context_blocks.move_to_end(key)
+        return context_blocks[key]
+
+    if context_builder is not None:
+        content = context_builder.build(docs_and_scores)
+    else:
+        content = "\n".join([doc.page_content.strip() for doc, _ in docs_and_scores])
+    block = format_context(content)
+    if key is not None:
+        context_blocks[key] = block
+        if len(context_blocks) > CONTEXT_BLOCK_CACHE_SIZE:
+            context_blocks.popitem(last=False)
+    return block
+
+def is_grounded(docs_and_scores) -> bool:
+    """Whether plan_answer answers from these documents: a strong enough top match whose original exists."""
+    if not docs_and_scores:
+        return False
+    top_doc, top_score = docs_and_scores[0]
+    return top_score >= SCORE_THRESHOLD and current_index().sources.get(top_doc.metadata.get("source")) is not None
+
+def plan_answer(question_text: str, docs_and_scores, history=()):
+    """Decide how to answer: returns (prompt, fixed_answer, source_file).
+
+    Exactly one of prompt / fixed_answer is set; the prompt still has to go through the LLM.
+    Grounded prompts are chat messages: the fixed system message first (so the backend can reuse
+    its prefill), then the document context block and the question as the user turn.
+    """
+    if not docs_and_scores:
+        # For general questions like "1+1" or "what should I eat"
+        return question_text, None, None
+
+    annotate(docs=[
+        {
+            "title": doc.metadata.get("title"),
+            "source": doc.metadata.get("source"),
+            "doc_type": doc.metadata.get("doc_type"),
+            "score": round(float(score), 4),
+        }
+        for doc, score in docs_and_scores
+    ])
+
+    top_doc, top_score = docs_and_scores[0]
+    source_file = top_doc.metadata.get("source", None)
+
+    if is_grounded(docs_and_scores):
+        if top_doc.metadata.get("doc_type") == "cover_page":
+            title = top_doc.metadata.get("title", "this document").upper()
+            answer = (
+                f"Yes, I can retrieve the cover page for this document. "
+                f"According to the document, the title is \"{title}\". "
+                f"It includes version control sections for Controlled and Uncontrolled Copy Numbers."
+            )
+            return None, answer, source_file
+        previous = [(turn.question, turn.answer) for turn in history]
+        return grounded_messages(context_block(docs_and_scores), question_text, previous), None, source_file
+
+    # Score too low or file not found: answer without the documents
+    annotate(grounded=False)
+    return question_text, None, source_file
+
+def embed_question(question_text: str):
+    if intent_classifier is not None:
+        return intent_classifier.embed(question_text)
+    return index_state.vectorstore.embeddings.embed_query(question_text.strip().lower())
+
+def answer_cache_scope(question_text: str) -> str:
+    # Same metadata filter as retrieval, so a "zoom meeting" paraphrase never reuses an unfiltered answer
+    return json.dumps(metadata_filter_for(question_text), sort_keys=True)
+
+def lookup_cached_answer(question_text: str):
+    if answer_cache is None:
+        return None
+    return answer_cache.get(question_text, lambda: embed_question(question_text), answer_cache_scope(question_text))
+
+def store_cached_answer(question_text: str, answer: str, source_file, docs_and_scores):
+    if answer_cache is None:
+        return
+    chunk_ids = [doc.id for doc, _ in docs_and_scores]
+    answer_cache.put(
+        question_text, embed_question(question_text), answer, source_file, chunk_ids, answer_cache_scope(question_text)
+    )
+
+def reference_payload(source_file):
+    return {
+        "url": f"http://localhost:8000/pdfs/{quote(source_file)}",
+        "name": source_file
+    } if source_file else None
+
+def busy_response():
+    return JSONResponse(
+        status_code=503,
+        content={"answer": BUSY_ANSWER, "reference_file": None},
+        headers={"Retry-After": "5"},
+    )
+
+def log_request(outcome: str, question_text: str, **fields):
+    """Queue one JSON-lines record for the request (with its stage timings) and count it in /metrics."""
+    trace = current_trace()
+    record = {"outcome": outcome, "question": question_text, **fields}
+    if trace is not None:
+        elapsed = trace.elapsed()
+        record = {"endpoint": trace.endpoint, **record, **trace.fields}
+        record["timings_ms"] = {**trace.timings_ms, "total": round(elapsed * 1000, 2)}
+        REQUEST_SECONDS.observe(elapsed, trace.endpoint)
+        REQUESTS.inc(1, trace.endpoint, outcome)
+    request_log.log(record)
+
+def log_personal_rejection(question_text: str, session_id=None):
+    log_request("rejected_personal", question_text, session_id=session_id)
+
+def log_exchange(question_text: str, answer: str, source_file, rejected: bool, session_id=None, cached=False):
+    log_request(
+        "cached" if cached else "answered", question_text,
+        session_id=session_id, answer=answer, source=source_file, rejection_tone=rejected,
+    )
+
+def log_failure(question_text: str, session_id=None):
+    log_request("error", question_text, session_id=session_id, error=traceback.format_exc())
+
+def is_follow_up(question_text: str) -> bool:
+    """Short questions that open with a connective or pronoun and lean on the previous turn.
+    One that matches the HR keywords stands on its own ("what about annual leave?")."""
+    question_text = question_text.strip()
+    return (
+        len(question_text.split()) <= 12
+        and bool(FOLLOW_UP_RE.match(question_text))
+        and not is_hr_query(question_text)
+    )
+
+def session_history(session_id, question_text: str):
+    """The session's recent turns if this question follows up on them, else ()."""
+    if not session_id or not is_follow_up(question_text):
+        return ()
+    return tuple(sessions.recent(session_id, SESSION_CONTEXT_TURNS))
+
+def previous_context(turn):
+    docs_and_scores = []
+    docstore = current_index().vectorstore.docstore
+    for doc_id, score in zip(turn.chunk_ids, turn.scores):
+        doc = docstore.search(doc_id)
+        if isinstance(doc, Document):
+            docs_and_scores.append((doc, score))
+    return docs_and_scores
+
+async def retrieve_with_history(question_text: str, history):
+    """(docs_and_scores, history) for plan_answer. A follow-up that retrieves nothing strong on its
+    own reuses the context of the last grounded turn; one grounded on its own, or rejected by the
+    HR gate, is answered without the history."""
+    docs_and_scores = await retrieve_documents(question_text)
+    if docs_and_scores is None:
+        # Off-topic: never borrow an earlier turn's documents past the HR gate
+        return [], ()
+    if not history or is_grounded(docs_and_scores):
+        return docs_and_scores, ()
+    for turn in reversed(history):
+        if turn.chunk_ids:
+            previous = await asyncio.to_thread(previous_context, turn)
+            if is_grounded(previous):
+                annotate(reused_previous_context=True)
+                return previous, history
+    return docs_and_scores, history
+
+def remember_turn(session_id, question_text: str, answer: str, source_file, docs_and_scores):
+    if session_id:
+        # Only chunks an answer was actually grounded in are worth reusing for a follow-up
+        grounded_docs = docs_and_scores if is_grounded(docs_and_scores) else ()
+        sessions.append(session_id, question_text, answer, source_file, grounded_docs)
+
 @app.post("/chat")
-def chat(question: Question):
-    print("❓ User Question:", question.question)
-    print("🕵️‍♀️ Chat history:", chat_history)
+async def chat(question: Question):
+    start_trace("/chat")
+    pin_index()
 
     # Reject clearly personal questions only
-    if is_personal_question(question.question):
-        with open("question_log.txt", "a", encoding="utf-8") as log_file:
-            log_file.write(f"[❌ Rejected Personal] {datetime.now().isoformat()} - Q: {question.question}\n---\n")
-        return {
-            "answer": (
-                "Sorry I am not qualified to answer this question as I am only designed to assist with Verztec's internal policies and HR-related queries. "
-                "For personal matters, I would recommend speaking to someone you trust or seek professional help."
-            ),
-            "reference_file": None
-        }
+    with stage("classify"):
+        personal = await asyncio.to_thread(is_personal_question, question.question)
+    if personal:
+        log_personal_rejection(question.question, question.session_id)
+        return {"answer": PERSONAL_REJECTION_ANSWER, "reference_file": None}
+
+    history = await asyncio.to_thread(session_history, question.session_id, question.question)
+    # Follow-ups depend on the conversation, so they skip the answer cache (and only fill it if answered without the history)
+    cached = None if history else await asyncio.to_thread(lookup_cached_answer, question.question)
+    if cached is not None:
+        log_exchange(question.question, cached.answer, cached.source_file, False, question.session_id, cached=True)
+        await asyncio.to_thread(remember_turn, question.session_id, question.question, cached.answer, cached.source_file, ())
+        return {"answer": cached.answer, "reference_file": reference_payload(cached.source_file)}
+
+    # Admission control: refuse up front instead of queueing behind a saturated backend
+    if llm_gate.is_full():
+        log_request("busy", question.question, session_id=question.session_id)
+        return busy_response()
 
     try:
-        # Only retrieve docs if it's HR-related
-        is_hr_like = is_hr_query(question.question)
-        is_llm_hr = is_hr_question_via_llm(question.question)
-
-        docs_and_scores = []
-        if is_hr_like or is_llm_hr:
-            docs_and_scores = vectorstore.similarity_search_with_score(question.question, k=3)
-            user_query = question.question.lower()
-
-            is_physical = any(term in user_query for term in ["physical meeting", "in person", "face to face", "onsite"])
-            is_digital = any(term in user_query for term in ["digital meeting", "online meeting", "virtual meeting", "zoom", "teams"])
-
-            if is_physical:
-                docs_and_scores = [(doc, score) for doc, score in docs_and_scores if doc.metadata.get("doc_type") == "physical"]
-            elif is_digital:
-                docs_and_scores = [(doc, score) for doc, score in docs_and_scores if doc.metadata.get("doc_type") == "digital"]
-
-        score_threshold = 0.38
-        answer = ""
-        source_file = None
-
-        system_prefix = (
-            "You are a professional HR assistant at Verztec.\n"
-            "Answer only using the content provided in the document — do not add anything outside of it.\n"
-            "Summarize all key points mentioned in the document, not just one. Keep the tone clear and professional, and do not skip relevant sections.\n"
-            "Avoid overly casual language like 'just a heads up', 'don’t worry', or 'let them know what’s going on'.\n"
-            "Speak as if you're helping a colleague or employee in a business setting.\n"
-            "Avoid numbered or overly formatted lists unless they already exist in the document.\n"
-            "Be clear, concise, and human — not robotic or overly formal."
-        )
-
-        if docs_and_scores:
-            for i, (doc, score) in enumerate(docs_and_scores):
-                print(f"📄 Doc {i+1}:")
-                print(f"   ↳ Title     : {doc.metadata.get('title')}")
-                print(f"   ↳ File      : {doc.metadata.get('source')}")
-                print(f"   ↳ Type      : {doc.metadata.get('doc_type')}")
-                print(f"   ↳ Score     : {score:.4f}")
-
-            top_doc, top_score = docs_and_scores[0]
-            content = "\n".join([doc.page_content.strip() for doc, _ in docs_and_scores])
-            source_file = top_doc.metadata.get("source", None)
-            file_path = os.path.join("data/pdfs", source_file) if source_file else ""
-
-            if top_score >= score_threshold and os.path.exists(file_path):
-                if top_doc.metadata.get("doc_type") == "cover_page":
-                    title = top_doc.metadata.get("title", "this document").upper()
-                    answer = (
-                        f"Yes, I can retrieve the cover page for this document. "
-                        f"According to the document, the title is \"{title}\". "
-                        f"It includes version control sections for Controlled and Uncontrolled Copy Numbers."
-                    )
-                else:
-                    full_prompt = (
-                        f"{system_prefix}\n"
-                        f"---\n{content}\n---\n"
-                        f"Based only on the content above, how would you answer this question?\n"
-                        f"{question.question}"
-                    )
-                    result = llama_pipeline.invoke(full_prompt)
-                    answer = truncate_answer(result.content)
-            else:
-                print("⚠️ Score too low or file not found. Skipping source.")
-                result = llama_pipeline.invoke(question.question)
-                answer = truncate_answer(result.content)
-        else:
-            # For general questions like "1+1" or "what should I eat"
-            result = llama_pipeline.invoke(question.question)
+        docs_and_scores, history = await retrieve_with_history(question.question, history)
+        prompt, answer, source_file = plan_answer(question.question, docs_and_scores, history)
+        if prompt is not None:
+            result = await generate(prompt)
             answer = truncate_answer(result.content)
 
-        if is_rejection_response(answer):
-            with open("question_log.txt", "a", encoding="utf-8") as log_file:
-                log_file.write(f"[⚠️ Rejection Tone] A: {answer}\n")
-
-        chat_history.append((question.question, answer))
-        with open("question_log.txt", "a", encoding="utf-8") as log_file:
-            log_file.write(f"{datetime.now().isoformat()} - Q: {question.question}\n")
-            log_file.write(f"A: {answer}\n")
-            if source_file:
-                log_file.write(f"Source: {source_file}\n")
-            log_file.write("---\n")
+        rejected = is_rejection_response(answer)
+        log_exchange(question.question, answer, source_file, rejected, question.session_id)
+        await asyncio.to_thread(remember_turn, question.session_id, question.question, answer, source_file, docs_and_scores)
+        if not rejected and not history:
+            await asyncio.to_thread(store_cached_answer, question.question, answer, source_file, docs_and_scores)
 
         return {
             "answer": answer,
-            "reference_file": {
-                "url": f"http://localhost:8000/pdfs/{quote(source_file)}",
-                "name": source_file
-            } if source_file else None
+            "reference_file": reference_payload(source_file)
         }
 
+    except LLMQueueFull:
+        log_request("busy", question.question, session_id=question.session_id)
+        return busy_response()
+    except Exception:
+        log_failure(question.question, question.session_id)
+        return {"answer": "Sorry, something went wrong.", "reference_file": None}
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_chat_events(question_text: str, session_id=None):
+    """SSE body for /chat/stream: `token` events while the LLM generates, then one `done` event
+    carrying the final (truncated) answer and the reference_file metadata."""
+    start_trace("/chat/stream")
+    pin_index()
+
+    with stage("classify"):
+        personal = await asyncio.to_thread(is_personal_question, question_text)
+    if personal:
+        log_personal_rejection(question_text, session_id)
+        yield sse_event("token", {"text": PERSONAL_REJECTION_ANSWER})
+        yield sse_event("done", {"answer": PERSONAL_REJECTION_ANSWER, "reference_file": None})
+        return
+
+    try:
+        history = await asyncio.to_thread(session_history, session_id, question_text)
+        cached = None if history else await asyncio.to_thread(lookup_cached_answer, question_text)
+        if cached is not None:
+            log_exchange(question_text, cached.answer, cached.source_file, False, session_id, cached=True)
+            await asyncio.to_thread(remember_turn, session_id, question_text, cached.answer, cached.source_file, ())
+            yield sse_event("token", {"text": cached.answer})
+            yield sse_event("done", {"answer": cached.answer, "reference_file": reference_payload(cached.source_file)})
+            return
+
+        docs_and_scores, history = await retrieve_with_history(question_text, history)
+        prompt, answer, source_file = plan_answer(question_text, docs_and_scores, history)
+
+        if prompt is None:
+            yield sse_event("token", {"text": answer})
+            rejected = is_rejection_response(answer)
+        else:
+            stream = StreamingAnswer()
+            queued = time.perf_counter()
+            async with llm_gate.slot():
+                observe_stage("llm_wait", time.perf_counter() - queued)
+                started = time.perf_counter()
+                first_token = True
+                async for chunk in chat_llm.astream(prompt):
+                    if chunk.response_metadata:
+                        # Only the final chunk carries Ollama's timings
+                        record_llm_usage(chunk.response_metadata)
+                    if first_token and chunk.content:
+                        observe_stage("first_token", time.perf_counter() - started)
+                        first_token = False
+                    text = stream.feed(chunk.content)
+                    if text:
+                        yield sse_event("token", {"text": text})
+                    if stream.done:
+                        # Word limit reached: stop generating instead of discarding the tail later
+                        break
+                observe_stage("generate", time.perf_counter() - started)
+            answer = stream.answer
+            rejected = stream.rejected
+
+        log_exchange(question_text, answer, source_file, rejected, session_id)
+        await asyncio.to_thread(remember_turn, session_id, question_text, answer, source_file, docs_and_scores)
+        if not rejected and not history:
+            await asyncio.to_thread(store_cached_answer, question_text, answer, source_file, docs_and_scores)
+        yield sse_event("done", {"answer": answer, "reference_file": reference_payload(source_file)})
+
+    except LLMQueueFull:
+        log_request("busy", question_text, session_id=session_id)
+        yield sse_event("error", {"answer": BUSY_ANSWER, "reference_file": None})
+    except Exception:
+        log_failure(question_text, session_id)
+        yield sse_event("error", {"answer": "Sorry, something went wrong.", "reference_file": None})
+
+@app.post("/chat/stream")
+async def chat_stream(question: Question):
+    if llm_gate.is_full():
+        return busy_response()
+    return StreamingResponse(
+        stream_chat_events(question.question, question.session_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# 🔥 Warmup and readiness
+readiness = {"ready": False, "warmup_seconds": None, "waiting_for": "warmup"}
+ready_callbacks = []  # serve.py adds one per worker to tell the master process
+
+def warm_up_retrieval():
+    """Encode and search WARMUP_QUESTION once, past the embedding cache, so the tokenizer, model
+    kernels, FAISS and BM25 are initialized. serve.py also runs this before forking its workers."""
+    index = index_state
+    embeddings = index.vectorstore.embedding_function
+    if isinstance(embeddings, CachedEmbeddings):
+        embeddings = embeddings.embeddings
+    vector = embeddings.embed_query(WARMUP_QUESTION)
+    index.vectorstore.similarity_search_with_score_by_vector(vector, k=3)
+    if index.bm25 is not None:
+        index.bm25.search(WARMUP_QUESTION, HYBRID_CANDIDATES)
+
+async def ping_llm():
+    # One token loads the model and prefills the shared system message. Only num_predict changes:
+    # an options={...} argument would replace the model's configured options (num_ctx among them),
+    # and Ollama would then reload the model on the first real request.
+    model = llama_pipeline.model_copy(update={"num_predict": 1}) if hasattr(llama_pipeline, "num_predict") else llama_pipeline
+    await model.bind(keep_alive=OLLAMA_KEEP_ALIVE).ainvoke([SYSTEM_MESSAGE, HumanMessage(content="Reply with OK.")])
+
+def mark_ready(started):
+    readiness.update(ready=True, warmup_seconds=round(time.perf_counter() - started, 2), waiting_for=None)
+    print(f"✅ Worker {os.getpid()} ready after {readiness['warmup_seconds']}s warmup")
+    for callback in ready_callbacks:
+        callback()
+
+async def finish_warmup(started):
+    while WARMUP_LLM_PING:
+        try:
+            await ping_llm()
+            break
+        except Exception as e:
+            # Retrieval already works; /ready stays 503 until the LLM answers
+            readiness["waiting_for"] = f"llm: {e}"
+            print(f"⏳ LLM not reachable yet ({e}), retrying in {WARMUP_RETRY_SECONDS}s")
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+    mark_ready(started)
+
+@app.on_event("startup")
+async def warm_up():
+    started = time.perf_counter()
+    await asyncio.to_thread(warm_up_retrieval)
+    # Same path as a real question, so the query batcher and reranker start in this worker's loop
+    await search_documents(WARMUP_QUESTION)
+    readiness["waiting_for"] = "llm"
+    app.state.warmup_task = asyncio.create_task(finish_warmup(started))
+
+@app.on_event("startup")
+async def start_index_watcher():
+    if INDEX_RELOAD_POLL_SECONDS:
+        app.state.index_watcher = asyncio.create_task(watch_index_versions())
+
+@app.get("/ready")
+def ready():
+    body = {**readiness, "pid": os.getpid(), "index_version": index_state.version}
+    return body if readiness["ready"] else JSONResponse(status_code=503, content=body)
+
+@app.post("/admin/reload")
+async def admin_reload(x_admin_token: Optional[str] = Header(default=None)):
+    # 🔒 No token configured means no admin API: CORS is open to every origin
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        return JSONResponse(status_code=403, content={"detail": "Forbidden"})
+    try:
+        seconds = await reload_index(force=True)
     except Exception as e:
-        print("❌ Exception in /chat endpoint")
         traceback.print_exc()
-        return {"answer": "Sorry, something went wrong.", "reference_file": None}
+        return JSONResponse(status_code=500, content={"reloaded": False, "version": index_state.version, "error": str(e)})
+    return {"reloaded": True, "version": index_state.version, "seconds": round(seconds, 2)}
+
+def not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+@app.api_route("/pdfs/{name:path}", methods=["GET", "HEAD"])
+def source_document(name: str, request: Request):
+    """Originals listed in the source registry. A repeated download is a conditional request answered
+    with 304, and FileResponse handles Range requests for the PDF viewer."""
+    entry = current_index().sources.get(name)
+    if entry is None:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    path = os.path.join(PDF_DIR, entry.name)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        # Deleted since the last ingest
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    # The registry's content hash only holds while the file is still the one ingest saw
+    etag = entry.etag if entry.matches(stat) else stat_etag(stat.st_size, stat.st_mtime)
+    headers = {"ETag": etag, "Last-Modified": formatdate(stat.st_mtime, usegmt=True), "Cache-Control": "no-cache"}
+    if not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers, stat_result=stat)
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+def cache_stats():
+    return answer_cache.snapshot() if answer_cache is not None else {"enabled": False}
+
+@app.get("/sessions/stats")
+def session_stats():
+    return sessions.snapshot()
+
+@app.get("/batching/stats")
+def batching_stats():
+    return query_batcher.snapshot() if query_batcher is not None else {"enabled": False}
 
 @app.get("/")
 def index():
@@ -0,0 +1,211 @@
+# serve.py - preload-and-fork server: one import of the app, several workers sharing it
+#
+#   cd chatbot
+#   python serve.py --workers 4 --port 8000
+#
+# main.py (langchain, the embedding model, FAISS/BM25 index, keyword matchers) is imported and warmed up once
+# in this master process; the workers are then forked and share those pages copy-on-write instead of each
+# loading its own copy. Each worker runs its own event loop, LLM warmup and /ready, and the master restarts
+# any worker that dies. Needs os.fork (Linux/macOS); on Windows keep using `python -m uvicorn main:app`.
+
+import os
+import gc
+import sys
+import time
+import atexit
+import select
+import signal
+import socket
+import argparse
+import traceback
+
+# The Rust tokenizers' thread pool does not survive a fork, so keep tokenization single-threaded
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+from chatbot.config import SERVE_HOST, SERVE_PORT, SERVE_WORKERS, EMBEDDING_BACKEND
+
+
+def load_app():
+    import main
+    return main
+
+
+def limit_inference_threads():
+    """Make torch and faiss single-threaded; returns a function that restores their thread counts.
+
+    An OpenMP thread pool started before a fork is a known way to hang the children in their first
+    parallel region. The master therefore preloads and warms up without ever starting one, and each
+    worker restores the configured thread counts after the fork.
+    """
+    import faiss
+
+    faiss_threads = faiss.omp_get_max_threads()
+    faiss.omp_set_num_threads(1)
+    torch = None
+    if EMBEDDING_BACKEND == "torch":
+        # Imported here already so the limit is in place before main.py's first encode
+        try:
+            import torch
+        except ImportError:
+            pass
+    if torch is not None:
+        torch_threads = torch.get_num_threads()
+        torch.set_num_threads(1)
+
+    def restore():
+        faiss.omp_set_num_threads(faiss_threads)
+        if torch is not None:
+            torch.set_num_threads(torch_threads)
+
+    return restore
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def memory_mb(pid):
+    """(RSS, PSS) of a process in MB. PSS splits shared pages between the processes sharing them,
+    so summed over master + workers it is the real footprint; summed RSS counts shared pages N times."""
+    rss = pss = 0.0
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) / 1024
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    pss = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return rss, pss
+
+
+def run_worker(app_module, load, sock, ready_fd, restore_threads=None):
+    import uvicorn
+
+    if restore_threads is not None:
+        restore_threads()
+    app_module = app_module or load()
+    app_module.ready_callbacks.append(lambda: os.write(ready_fd, b"r"))
+    server = uvicorn.Server(uvicorn.Config(app_module.app, log_level="warning"))
+    server.run(sockets=[sock])
+
+
+def worker_exit(signum, frame):
+    sys.exit(0)
+
+
+def spawn(app_module, load, sock, ready_fd, restore_threads=None):
+    pid = os.fork()
+    if pid:
+        return pid
+    # Not the master's handler (it signals every worker). uvicorn installs its own while serving and
+    # re-raises the signal after its graceful shutdown, which then ends up here as a clean exit.
+    signal.signal(signal.SIGINT, worker_exit)
+    signal.signal(signal.SIGTERM, worker_exit)
+    code = 0
+    try:
+        run_worker(app_module, load, sock, ready_fd, restore_threads)
+    except SystemExit as e:
+        code = e.code or 0
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        # os._exit skips atexit, and the request log flushes there
+        atexit._run_exitfuncs()
+        os._exit(code)
+
+
+def serve(host=SERVE_HOST, port=SERVE_PORT, workers=SERVE_WORKERS, preload=True, load=load_app, on_ready=None):
+    """Run `workers` forked uvicorn workers on one listening socket until SIGINT/SIGTERM.
+
+    With `preload` the app is imported and warmed up here before forking; without it every worker
+    imports it itself (the old `uvicorn --workers N` behaviour, kept for comparison). `on_ready` is
+    called once with the startup report when every worker has signalled ready.
+    """
+    started = time.perf_counter()
+    sock = bind_socket(host, port)
+    app_module = None
+    restore_threads = None
+    if preload:
+        restore_threads = limit_inference_threads()
+        app_module = load()
+        app_module.warm_up_retrieval()
+        # Everything alive now is left alone by the workers' GC, so collections do not write to (and copy) these pages
+        gc.collect()
+        gc.freeze()
+        print(f"📦 Preloaded the app in {time.perf_counter() - started:.1f}s, RSS {memory_mb(os.getpid())[0]:.0f} MB")
+
+    ready_r, ready_w = os.pipe()
+    children = {spawn(app_module, load, sock, ready_w, restore_threads) for _ in range(workers)}
+    print(f"🍴 Forked {workers} worker(s) on {host}:{port}: {', '.join(map(str, sorted(children)))}")
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    ready = 0
+    reported = False
+    while children:
+        try:
+            readable, _, _ = select.select([ready_r], [], [], 0.5)
+        except InterruptedError:
+            readable = []
+        if readable:
+            ready += len(os.read(ready_r, 64))
+        if not reported and ready >= workers:
+            reported = True
+            usage = [memory_mb(pid) for pid in [os.getpid(), *children]]
+            report = {
+                "workers": workers,
+                "preload": preload,
+                "time_to_ready_s": round(time.perf_counter() - started, 2),
+                "rss_total_mb": round(sum(rss for rss, _ in usage), 1),
+                "pss_total_mb": round(sum(pss for _, pss in usage), 1),
+            }
+            print(
+                f"✅ {workers}/{workers} worker(s) ready in {report['time_to_ready_s']}s, "
+                f"total RSS {report['rss_total_mb']:.0f} MB (PSS {report['pss_total_mb']:.0f} MB)"
+            )
+            if on_ready is not None:
+                on_ready(report)
+
+        while children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if not pid:
+                break
+            children.discard(pid)
+            if not stopping:
+                print(f"⚠️ Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, starting a new one")
+                time.sleep(1)
+                children.add(spawn(app_module, load, sock, ready_w, restore_threads))
+    sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the chatbot with preloaded, forked workers.")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--no-preload", action="store_true", help="let each worker import the app itself")
+    args = parser.parse_args()
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs os.fork; on Windows run `python -m uvicorn main:app` instead.")
+    serve(args.host, args.port, args.workers, preload=not args.no_preload)